@@ -6,42 +6,89 @@ End-to-end audio processing with Whisper STT and multi-engine TTS
 
 import asyncio
 import base64
+import concurrent.futures
+import functools
+import importlib.util
+import io
 import logging
+import math
 import os
+import shutil
 import tempfile
 import time
 from pathlib import Path
-from typing import Dict, Optional, Tuple, Union
-
-try:
-    import whisper
-    import torch
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
-    whisper = None
-
-try:
-    import librosa
-    import soundfile as sf
-    AUDIO_PROCESSING_AVAILABLE = True
-except ImportError:
-    AUDIO_PROCESSING_AVAILABLE = False
-    librosa = None
-    sf = None
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+# Heavy STT/audio libraries are imported by _import_audio_backends() on first
+# initialize(); at module import we only probe that they are installed
+WHISPER_AVAILABLE = importlib.util.find_spec("faster_whisper") is not None
+AUDIO_PROCESSING_AVAILABLE = all(
+    importlib.util.find_spec(module) is not None for module in ("numpy", "soundfile", "soxr")
+)
+
+torch = None
+np = None
+sf = None
+soxr = None
+BatchedInferencePipeline = None
+WhisperModel = None
+decode_audio = None
 
 from language_detector import LanguageDetector
 from tts_manager import HinglishTTSManager
 
 logger = logging.getLogger(__name__)
 
+# Fallback replies keyed by (language, has_text) -> (template, response language)
+FALLBACK_RESPONSES = {
+    ("hi", False): ("मुझे समझ नहीं आया। कृपया फिर से कहें।", "hi"),
+    ("en", False): ("I didn't understand. Please say that again.", "en"),
+    ("hi", True): ("आपने कहा: {text}। यह एक परीक्षण उत्तर है।", "hi"),
+    ("en", True): ("You said: {text}. This is a test response.", "en"),
+    ("hi-en", True): ("You said: {text}। यह एक mixed response है।", "hi-en"),
+}
+
+# Ollama client shared by every AudioPipeline in the process
+_ollama_client = None
+_ollama_lock = asyncio.Lock()
+
+def _import_audio_backends():
+    """Import faster-whisper, torch and the audio processing libraries into module scope"""
+    global torch, np, sf, soxr, BatchedInferencePipeline, WhisperModel, decode_audio
+    
+    if WHISPER_AVAILABLE and WhisperModel is None:
+        # faster-whisper depends on numpy, so it is always importable alongside it
+        import numpy as np
+        from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+    
+    if torch is None:
+        try:
+            import torch
+        except ImportError:
+            pass
+    
+    if AUDIO_PROCESSING_AVAILABLE and sf is None:
+        import numpy as np
+        import soundfile as sf
+        import soxr
+
+@functools.lru_cache(maxsize=4)
+def _load_whisper(model_name: str, device: str, compute_type: str):
+    """Load a Whisper model once per (model, device, compute type) and share it"""
+    return WhisperModel(model_name, device=device, compute_type=compute_type)
+
 class AudioPipeline:
     """End-to-end audio processing pipeline with STT and TTS"""
     
     def __init__(self, language_detector: LanguageDetector, tts_manager: HinglishTTSManager):
         self.language_detector = language_detector
         self.tts_manager = tts_manager
+        self.ollama_client = None
         self.whisper_model = None
+        self.batched_model = None
+        self.device = None
+        self.compute_type = None
+        self.batch_size = 1
         
         # Configuration
         self.config = {
@@ -49,10 +96,20 @@ class AudioPipeline:
             "sample_rate": 16000,     # Whisper expects 16kHz
             "chunk_duration": 30,     # Maximum chunk duration in seconds
             "min_audio_length": 0.5,  # Minimum audio length to process
+            "vad_min_silence_ms": 500,  # Silero VAD: silence gap that splits speech regions
+            "language_fallback_threshold": 0.4,  # Re-run with Hindi below this detection probability
             "enable_preprocessing": True,
-            "hinglish_mode": True     # Enable Hinglish-specific processing
+            "hinglish_mode": True,    # Enable Hinglish-specific processing
+            "batch_size": "auto",     # 30s windows encoded together ("auto" = sized from VRAM)
+            "cpu_compute_type": "int8",      # CTranslate2 compute type on CPU
+            "gpu_compute_type": "auto"       # "auto" = bfloat16 on Ampere+, else float16
         }
         
+        # Dedicated executors, created in initialize(): the STT pool is sized once the
+        # device is known, while audio decoding gets its own pool
+        self._stt_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        
         self.temp_dir = Path(tempfile.gettempdir()) / "hinglish_audio"
         self.temp_dir.mkdir(exist_ok=True)
         
@@ -63,22 +120,42 @@ class AudioPipeline:
         logger.info("Initializing Audio Pipeline...")
         
         if not WHISPER_AVAILABLE:
-            raise RuntimeError("Whisper not available. Install with: pip install openai-whisper")
+            raise RuntimeError("Whisper not available. Install with: pip install faster-whisper")
         
         if not AUDIO_PROCESSING_AVAILABLE:
             logger.warning("Audio processing libraries not available. Some features may be limited.")
         
-        # Load Whisper model
+        if not self._cpu_pool:
+            self._cpu_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, (os.cpu_count() or 2) // 2), thread_name_prefix="audio-prep"
+            )
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._cpu_pool, _import_audio_backends)
+        
+        # Load Whisper model (CTranslate2 backend, quantized weights)
         try:
-            logger.info(f"Loading Whisper model: {self.config['whisper_model']}")
+            self.device, self.compute_type = self._resolve_compute_type()
+            
+            # A single STT worker keeps concurrent transcriptions from oversubscribing the GPU
+            if not self._stt_pool:
+                self._stt_pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1 if self.device == "cuda" else 2,
+                    thread_name_prefix="whisper-stt"
+                )
+            
+            logger.info(f"Loading Whisper model: {self.config['whisper_model']} ({self.device}, {self.compute_type})")
             # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
             self.whisper_model = await loop.run_in_executor(
-                None, 
-                whisper.load_model, 
-                self.config['whisper_model']
+                self._stt_pool,
+                _load_whisper,
+                self.config['whisper_model'],
+                self.device,
+                self.compute_type
             )
-            logger.info("Whisper model loaded successfully")
+            self.batched_model = BatchedInferencePipeline(model=self.whisper_model)
+            self.batch_size = self._resolve_batch_size()
+            logger.info(f"Whisper model loaded successfully on {self.whisper_model.model.device}")
             
             # Test model with a small audio snippet
             await self._test_whisper_model()
@@ -87,47 +164,81 @@ class AudioPipeline:
             logger.error(f"Failed to initialize Whisper model: {e}")
             raise
 
+    def _resolve_compute_type(self) -> Tuple[str, str]:
+        """Pick the Whisper device and CTranslate2 compute type for this host"""
+        if not (torch and torch.cuda.is_available()):
+            return "cpu", self.config["cpu_compute_type"]
+        
+        compute_type = self.config["gpu_compute_type"]
+        if compute_type == "auto":
+            major, _ = torch.cuda.get_device_capability()
+            compute_type = "bfloat16" if major >= 8 else "float16"
+        
+        return "cuda", compute_type
+
+    def _resolve_batch_size(self) -> int:
+        """Pick how many 30s windows the batched pipeline encodes per call"""
+        if self.config["batch_size"] != "auto":
+            return int(self.config["batch_size"])
+        
+        if self.device != "cuda":
+            return 4
+        
+        total_vram_gb = torch.cuda.get_device_properties(0).total_memory / 1024 ** 3
+        if total_vram_gb < 6:
+            return 4
+        elif total_vram_gb < 12:
+            return 8
+        else:
+            return 16
+
     async def _test_whisper_model(self):
         """Test Whisper model with a simple audio test"""
         try:
             # Create a simple test audio (silence)
             import numpy as np
-            test_audio = np.zeros(16000)  # 1 second of silence
+            test_audio = np.zeros(16000, dtype=np.float32)  # 1 second of silence
             
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             result = await loop.run_in_executor(
-                None,
-                self.whisper_model.transcribe,
-                test_audio
+                self._stt_pool,
+                self._whisper_transcribe_with_options,
+                test_audio,
+                {}
             )
             logger.info("Whisper model test completed successfully")
             
         except Exception as e:
             logger.warning(f"Whisper model test failed: {e}")
 
-    async def process_audio(self, audio_path: Union[str, Path], conversation_mode: str = "hinglish") -> Dict:
+    async def process_audio(self, audio_path: Union[str, Path, BinaryIO], conversation_mode: str = "hinglish") -> Dict:
         """
         Process audio file through the complete pipeline
         
         Args:
-            audio_path: Path to the audio file
+            audio_path: Path to the audio file, or an in-memory file-like object
             
         Returns:
             Dictionary with transcription, AI response, and TTS audio
         """
-        audio_path = Path(audio_path)
-        
-        if not audio_path.exists():
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        start_time = time.perf_counter()
         
-        logger.info(f"Processing audio file: {audio_path}")
+        if isinstance(audio_path, io.IOBase):
+            logger.info("Processing in-memory audio")
+        else:
+            audio_path = Path(audio_path)
+            
+            if not audio_path.exists():
+                raise FileNotFoundError(f"Audio file not found: {audio_path}")
+            
+            logger.info(f"Processing audio file: {audio_path}")
         
         try:
             # Step 1: Preprocess audio
-            processed_audio_path = await self._preprocess_audio(audio_path)
+            processed_audio = await self._preprocess_audio(audio_path)
             
             # Step 2: Speech-to-text with Whisper
-            transcription_result = await self._transcribe_audio(processed_audio_path)
+            transcription_result = await self._transcribe_audio(processed_audio)
             
             # Step 3: Language detection
             detected_language = self.language_detector.detect_language(
@@ -147,23 +258,19 @@ class AudioPipeline:
                 ai_response["language"]
             )
             
-            # Clean up temporary files
-            if processed_audio_path != audio_path:
-                processed_audio_path.unlink(missing_ok=True)
-            
             return {
                 "transcription": transcription_result["text"],
                 "transcription_language": detected_language,
                 "transcription_confidence": transcription_result.get("confidence", 0.0),
                 "response": ai_response["text"],
                 "response_language": ai_response["language"],
-                "audio_base64": tts_result.audio_base64,
+                "audio_bytes": tts_result.audio_data,
                 "tts_engine": tts_result.engine,
                 "detected_language": detected_language,
                 "processing_time": {
                     "transcription": transcription_result.get("duration", 0.0),
                     "tts": tts_result.duration,
-                    "total": time.time() - self.start_time if hasattr(self, 'start_time') else 0.0
+                    "total": time.perf_counter() - start_time
                 }
             }
             
@@ -171,93 +278,101 @@ class AudioPipeline:
             logger.error(f"Audio processing failed: {e}")
             raise
 
-    async def _preprocess_audio(self, audio_path: Path) -> Path:
-        """Preprocess audio for optimal Whisper performance"""
+    async def _preprocess_audio(self, audio_path: Union[Path, BinaryIO]) -> Union["np.ndarray", str, BinaryIO]:
+        """
+        Preprocess audio for optimal Whisper performance
+        
+        Returns the 16kHz float32 samples in memory, or the original file path
+        (or buffer) when preprocessing is disabled or fails (Whisper decodes it itself).
+        """
         if not self.config["enable_preprocessing"] or not AUDIO_PROCESSING_AVAILABLE:
-            return audio_path
+            return self._original_audio(audio_path)
+        
+        if not self._cpu_pool:
+            raise RuntimeError("Audio pipeline not initialized")
         
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._cpu_pool, self._preprocess_audio_sync, audio_path)
+
+    def _original_audio(self, audio_path: Union[Path, BinaryIO]) -> Union[str, BinaryIO]:
+        """Return the unprocessed input in a form Whisper can decode"""
+        if isinstance(audio_path, io.IOBase):
+            audio_path.seek(0)
+            return audio_path
+        return str(audio_path)
+
+    def _preprocess_audio_sync(self, audio_path: Union[Path, BinaryIO]) -> Union["np.ndarray", str, BinaryIO]:
+        """Decode, downmix, resample and normalize audio (runs on the CPU pool)"""
         try:
-            # Load audio
-            audio, sr = librosa.load(str(audio_path), sr=None)
+            # Load audio as float32, downmixing to mono
+            source = audio_path if isinstance(audio_path, io.IOBase) else str(audio_path)
+            audio, sr = sf.read(source, dtype="float32", always_2d=False)
+            if audio.ndim > 1:
+                audio = audio.mean(axis=1)
             
             # Resample to 16kHz for Whisper
             if sr != self.config["sample_rate"]:
-                audio = librosa.resample(
-                    audio, 
-                    orig_sr=sr, 
-                    target_sr=self.config["sample_rate"]
-                )
+                audio = soxr.resample(audio, sr, self.config["sample_rate"], quality="HQ")
             
             # Normalize audio
-            audio = librosa.util.normalize(audio)
-            
-            # Remove silence at the beginning and end
-            audio, _ = librosa.effects.trim(audio, top_db=20)
+            peak = np.max(np.abs(audio)) if audio.size else 0.0
+            if peak > 0:
+                audio *= 1.0 / peak
             
             # Check minimum length
             min_samples = int(self.config["min_audio_length"] * self.config["sample_rate"])
             if len(audio) < min_samples:
                 logger.warning(f"Audio too short: {len(audio)/self.config['sample_rate']:.2f}s")
-                return audio_path
+                return self._original_audio(audio_path)
             
-            # Save processed audio
-            processed_path = self.temp_dir / f"processed_{audio_path.name}"
-            sf.write(str(processed_path), audio, self.config["sample_rate"])
-            
-            logger.info(f"Audio preprocessed: {processed_path}")
-            return processed_path
+            logger.info(f"Audio preprocessed: {len(audio)/self.config['sample_rate']:.2f}s")
+            return audio
             
         except Exception as e:
             logger.warning(f"Audio preprocessing failed: {e}, using original")
-            return audio_path
+            return self._original_audio(audio_path)
 
-    async def _transcribe_audio(self, audio_path: Path) -> Dict:
+    async def _transcribe_audio(self, audio: Union["np.ndarray", str, BinaryIO]) -> Dict:
         """Transcribe audio using Whisper with Hinglish support"""
         if not self.whisper_model:
             raise RuntimeError("Whisper model not initialized")
         
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             # Prepare Whisper options for Hinglish
             transcribe_options = {
                 "language": None,  # Let Whisper auto-detect
                 "task": "transcribe",
-                "fp16": torch.cuda.is_available(),  # Use FP16 if GPU available
+                "beam_size": 1,
+                # Silero VAD drops leading, trailing and interior silence before encoding
+                "vad_filter": True,
+                "vad_parameters": {"min_silence_duration_ms": self.config["vad_min_silence_ms"]},
             }
             
-            # For Hinglish, we might want to try Hindi first, then English
-            if self.config["hinglish_mode"]:
-                # Try Hindi detection first
-                transcribe_options["language"] = "hi"
+            # Decode file inputs once so a language fallback re-run reuses the samples
+            if isinstance(audio, (str, io.IOBase)):
+                audio = await asyncio.get_running_loop().run_in_executor(
+                    self._cpu_pool,
+                    functools.partial(decode_audio, audio, sampling_rate=self.config["sample_rate"])
+                )
             
-            # Run transcription in thread pool
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                self._whisper_transcribe_with_options,
-                str(audio_path),
-                transcribe_options
-            )
+            # Run transcription in thread pool (language detected in the same pass)
+            result = await self._submit_transcription(audio, transcribe_options)
             
             transcribed_text = result["text"].strip()
             
-            # If Hindi transcription gives poor results, try English
+            # For Hinglish, only re-run when detection was unsure and landed outside Hindi/English
             if (self.config["hinglish_mode"] and 
-                len(transcribed_text) < 10 and 
-                transcribe_options["language"] == "hi"):
+                result.get("language") not in ("hi", "en") and 
+                result.get("language_probability", 0.0) < self.config["language_fallback_threshold"]):
                 
-                logger.info("Retrying transcription with English")
-                transcribe_options["language"] = "en"
-                result = await loop.run_in_executor(
-                    None,
-                    self._whisper_transcribe_with_options,
-                    str(audio_path),
-                    transcribe_options
-                )
+                logger.info(f"Low-confidence language '{result.get('language')}', retrying transcription with Hindi")
+                transcribe_options["language"] = "hi"
+                result = await self._submit_transcription(audio, transcribe_options)
                 transcribed_text = result["text"].strip()
             
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             
             # Calculate confidence score from segments if available
             confidence = self._calculate_confidence(result)
@@ -276,9 +391,49 @@ class AudioPipeline:
             logger.error(f"Transcription failed: {e}")
             raise
 
-    def _whisper_transcribe_with_options(self, audio_path: str, options: Dict) -> Dict:
-        """Helper method to run Whisper transcription with specific options"""
-        return self.whisper_model.transcribe(audio_path, **options)
+    async def _submit_transcription(self, audio: Union["np.ndarray", str], options: Dict) -> Dict:
+        """Run one transcription in the executor and return as soon as it finishes"""
+        # Utterances can't be stacked into one transcribe() call; batching happens
+        # inside BatchedInferencePipeline across the chunks of a single utterance
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._stt_pool,
+            self._whisper_transcribe_with_options,
+            audio,
+            dict(options)  # Copy so a later retry can't mutate an in-flight request
+        )
+
+    def _whisper_transcribe_with_options(self, audio: Union["np.ndarray", str], options: Dict) -> Dict:
+        """Helper method to run Whisper transcription on samples or a file path"""
+        if self.batched_model:
+            # Long audio is split into chunk_duration windows that are encoded as one batch
+            segments, info = self.batched_model.transcribe(
+                audio,
+                batch_size=self.batch_size,
+                chunk_length=self.config["chunk_duration"],
+                **options
+            )
+        else:
+            segments, info = self.whisper_model.transcribe(audio, **options)
+        
+        # faster-whisper yields segments lazily; materialize to run the decode
+        segment_dicts = [
+            {
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "avg_logprob": segment.avg_logprob,
+                "confidence": math.exp(segment.avg_logprob)
+            }
+            for segment in segments
+        ]
+        
+        return {
+            "text": "".join(segment["text"] for segment in segment_dicts),
+            "segments": segment_dicts,
+            "language": info.language,
+            "language_probability": info.language_probability
+        }
 
     def _calculate_confidence(self, whisper_result: Dict) -> float:
         """Calculate average confidence score from Whisper segments"""
@@ -286,18 +441,17 @@ class AudioPipeline:
         if not segments:
             return 0.0
         
-        # Calculate average confidence from segments
-        total_confidence = 0.0
-        total_duration = 0.0
-        
-        for segment in segments:
-            if "confidence" in segment and "end" in segment and "start" in segment:
-                duration = segment["end"] - segment["start"]
-                total_confidence += segment["confidence"] * duration
-                total_duration += duration
+        # Duration-weighted average confidence, reduced in numpy
+        timed_segments = [
+            segment for segment in segments
+            if "confidence" in segment and "end" in segment and "start" in segment
+        ]
+        confidences = np.asarray([segment["confidence"] for segment in timed_segments], dtype=np.float64)
+        durations = np.asarray([segment["end"] - segment["start"] for segment in timed_segments], dtype=np.float64)
+        total_duration = durations.sum()
         
         if total_duration > 0:
-            return total_confidence / total_duration
+            return float(np.dot(confidences, durations) / total_duration)
         else:
             return 0.8  # Default confidence if no segment data
 
@@ -305,28 +459,16 @@ class AudioPipeline:
         """
         Get AI response using OllamaClient (with RAG if available)
         """
-        # Import here to avoid circular import
-        from ollama_client import OllamaClient
-        
-        if not hasattr(self, 'ollama_client'):
-            # Initialize Ollama client if not already done
-            self.ollama_client = OllamaClient()
+        if not self.ollama_client:
             try:
-                await self.ollama_client.initialize()
-                
-                # Check for global RAG system and initialize it
-                await self._check_and_initialize_rag()
-                
+                self.ollama_client = await self._get_shared_ollama_client()
             except Exception as e:
                 logger.warning(f"Failed to initialize Ollama client: {e}")
                 # Fallback to simple responses
                 return self._get_fallback_response(text, language)
         
         try:
-            # Check if ollama_client is properly initialized
-            if not self.ollama_client:
-                logger.warning("Ollama client is None, using fallback response")
-                return self._get_fallback_response(text, language)
+            response_language = None
             
             # Get AI response (with RAG if available)
             if hasattr(self.ollama_client, 'rag_enabled') and self.ollama_client.rag_enabled:
@@ -342,9 +484,16 @@ class AudioPipeline:
             else:
                 # Standard response
                 ai_response = await self.ollama_client.get_response(text, language_hint=language, scenario=conversation_mode)
+                
+                # get_response locks its system prompt to a hi/en hint, so the reply is
+                # already in that language
+                if language in ("hi", "en") and self.ollama_client.config.get("hinglish_mode", True):
+                    response_language = language
             
-            # Detect language of response
-            response_language = self.language_detector.detect_language(ai_response)
+            # The RAG prompt only mirrors the user's language and allows romanized
+            # Hindi, so its replies (and free-form Hinglish) are re-detected
+            if response_language is None:
+                response_language = self.language_detector.detect_language(ai_response)
             
             return {
                 "text": ai_response,
@@ -355,7 +504,25 @@ class AudioPipeline:
             logger.error(f"Ollama response failed: {e}")
             return self._get_fallback_response(text, language)
 
-    async def _check_and_initialize_rag(self):
+    async def _get_shared_ollama_client(self):
+        """Return the process-wide OllamaClient, creating and warming it on first use"""
+        global _ollama_client
+        
+        # Import here to avoid circular import
+        from ollama_client import OllamaClient
+        
+        async with _ollama_lock:
+            if _ollama_client is None:
+                client = OllamaClient()
+                await client.initialize()
+                
+                # Check for global RAG system and initialize it
+                await self._check_and_initialize_rag(client)
+                _ollama_client = client
+        
+        return _ollama_client
+
+    async def _check_and_initialize_rag(self, ollama_client):
         """Check for global RAG system and initialize it in ollama_client if available"""
         try:
             from pathlib import Path
@@ -385,7 +552,7 @@ class AudioPipeline:
                 
                 if total_chunks > 0:
                     # Initialize RAG in ollama client
-                    self.ollama_client.initialize_rag(rag_pipeline)
+                    ollama_client.initialize_rag(rag_pipeline)
                     logger.info(f"Audio pipeline initialized with RAG: {total_chunks} chunks available")
                 else:
                     logger.debug("Vector database is empty for audio pipeline")
@@ -401,26 +568,15 @@ class AudioPipeline:
     def _get_fallback_response(self, text: str, language: str) -> Dict:
         """Fallback response when Ollama is not available"""
         if not text.strip():
-            if language.startswith("hi"):
-                response_text = "मुझे समझ नहीं आया। कृपया फिर से कहें।"
-                response_lang = "hi"
-            else:
-                response_text = "I didn't understand. Please say that again."
-                response_lang = "en"
+            key = ("hi" if language.startswith("hi") else "en", False)
         else:
             # Simple echo response for testing
-            if language == "hi":
-                response_text = f"आपने कहा: {text}। यह एक परीक्षण उत्तर है।"
-                response_lang = "hi"
-            elif language == "en":
-                response_text = f"You said: {text}. This is a test response."
-                response_lang = "en"
-            else:  # Mixed language
-                response_text = f"You said: {text}। यह एक mixed response है।"
-                response_lang = "hi-en"
+            key = (language if language in ("hi", "en") else "hi-en", True)
+        
+        template, response_lang = FALLBACK_RESPONSES[key]
         
         return {
-            "text": response_text,
+            "text": template.format(text=text),
             "language": response_lang
         }
 
@@ -432,18 +588,14 @@ class AudioPipeline:
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
         
         # Preprocess and transcribe
-        processed_audio_path = await self._preprocess_audio(audio_path)
-        transcription_result = await self._transcribe_audio(processed_audio_path)
+        processed_audio = await self._preprocess_audio(audio_path)
+        transcription_result = await self._transcribe_audio(processed_audio)
         
         # Language detection
         detected_language = self.language_detector.detect_language(
             transcription_result["text"]
         )
         
-        # Clean up
-        if processed_audio_path != audio_path:
-            processed_audio_path.unlink(missing_ok=True)
-        
         return {
             "transcription": transcription_result["text"],
             "language": detected_language,
@@ -472,7 +624,7 @@ class AudioPipeline:
         if model_name in ["tiny", "base", "small", "medium", "large"]:
             self.config["whisper_model"] = model_name
             logger.info(f"Whisper model set to: {model_name}")
-            # Note: Will require calling initialize() again
+            # Note: Will require calling initialize() again (cached models load instantly)
         else:
             logger.warning(f"Invalid Whisper model: {model_name}")
 
@@ -490,19 +642,23 @@ class AudioPipeline:
         logger.info("Cleaning up Audio Pipeline...")
         
         # Clean up temporary files
-        if self.temp_dir.exists():
-            for temp_file in self.temp_dir.glob("*"):
-                try:
-                    temp_file.unlink()
-                except Exception as e:
-                    logger.warning(f"Failed to delete {temp_file}: {e}")
-        
-        # Clean up Whisper model
-        if self.whisper_model:
-            del self.whisper_model
-            self.whisper_model = None
-        
-        # Clear GPU cache if using CUDA
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        self.temp_dir.mkdir(exist_ok=True)
+        
+        # Drop only this instance's references; the module-level cache may still
+        # be serving the same model to other live pipelines
+        self.whisper_model = None
+        self.batched_model = None
+        
+        # Shut down dedicated executors
+        if self._stt_pool:
+            self._stt_pool.shutdown(wait=False, cancel_futures=True)
+            self._stt_pool = None
+        if self._cpu_pool:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self._cpu_pool = None
+        
+        # Clear GPU cache if using CUDA (shutdown only; per-request clearing defeats allocator reuse)
         if torch and torch.cuda.is_available():
             torch.cuda.empty_cache()
         
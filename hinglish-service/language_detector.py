@@ -4,21 +4,75 @@ Language Detection Module
 Advanced language detection for Hindi vs English content with Devanagari script recognition
 """
 
+import os
 import re
+import functools
 import logging
+from collections import Counter
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
 try:
     from langdetect import detect, detect_langs
+    from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
     from langdetect.lang_detect_exception import LangDetectException
 except ImportError:
     detect = None
     detect_langs = None
+    DetectorFactory = None
+    PROFILES_DIRECTORY = None
     LangDetectException = Exception
+else:
+    # Deterministic langdetect results, so cached detections stay valid
+    DetectorFactory.seed = 0
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = NUMPY_AVAILABLE
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _count_scripts(codes, whitespace_table):
+        """Count spaces, whitespace, Devanagari and Latin codepoints in one native loop"""
+        spaces = whitespace = devanagari = latin = 0
+        for code in codes:
+            if code < whitespace_table.size and whitespace_table[code]:
+                whitespace += 1
+                if code == 0x20:
+                    spaces += 1
+            elif 0x0900 <= code <= 0x097F or 0xA8E0 <= code <= 0xA8FF:  # devanagari_range
+                devanagari += 1
+            elif 0x41 <= code <= 0x5A or 0x61 <= code <= 0x7A:
+                latin += 1
+        return spaces, whitespace, devanagari, latin
+
+# langdetect profiles consulted by _statistical_analysis (Hindi, English and related)
+LANGDETECT_PROFILES = ("hi", "en", "ur", "ne", "mr")
+
+@functools.lru_cache(maxsize=1)
+def _langdetect_factory():
+    """Load only the needed langdetect profiles, once per process"""
+    profiles = []
+    for lang in LANGDETECT_PROFILES:
+        with open(os.path.join(PROFILES_DIRECTORY, lang), encoding="utf-8") as f:
+            profiles.append(f.read())
+    
+    factory = DetectorFactory()
+    factory.load_json_profile(profiles)
+    return factory
+
 @dataclass
 class DetectionResult:
     """Language detection result with confidence scores"""
@@ -38,18 +92,61 @@ class LanguageDetector:
             "confidence_threshold": 0.7  # Minimum confidence for reliable detection
         }
         
+        # Weights of the script, statistical and pattern analyses when combined
+        self.analysis_weights = (0.4, 0.4, 0.2)
+        
         # Devanagari Unicode ranges
         self.devanagari_range = [
             (0x0900, 0x097F),  # Devanagari
             (0xA8E0, 0xA8FF),  # Devanagari Extended
         ]
+        self._devanagari_chars = frozenset(
+            chr(code) for start, end in self.devanagari_range for code in range(start, end + 1)
+        )
+        
+        # Translation table classifying characters for _analyze_script:
+        # Devanagari -> 'D', ASCII letters -> 'L', whitespace -> deleted
+        script_map = {}
+        for start, end in self.devanagari_range:
+            script_map.update(dict.fromkeys(range(start, end + 1), "D"))
+        for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz":
+            script_map[ord(letter)] = "L"
+        for code in range(0x3001):  # all Unicode whitespace lies below U+3001
+            if chr(code).isspace():
+                script_map[code] = None
+        self._script_table = str.maketrans(script_map)
+        
+        # Long texts are classified over the codepoint array (numba kernel or numpy masks)
+        self.numpy_script_min_length = 200
+        if NUMPY_AVAILABLE:
+            self._whitespace_codes = np.array(
+                [code for code, value in script_map.items() if value is None], dtype=np.uint32
+            )
+        if NUMBA_AVAILABLE:
+            self._whitespace_table = np.zeros(0x3001, dtype=np.uint8)
+            self._whitespace_table[self._whitespace_codes] = 1
+            # Compile (or load the cached kernel) now rather than on the first request
+            _count_scripts(np.zeros(1, dtype=np.uint32), self._whitespace_table)
+        
+        # Precompiled patterns for text cleaning
+        self._ws_re = re.compile(r'\s+')
+        # URLs, emails and other non-linguistic content, stripped in a single pass
+        self._noise_strip_re = re.compile(
+            r'http[s]?://\S+|www\.\S+|\S+@\S+\.\S+|[^\w\s\u0900-\u097F\u0020-\u007E]'
+        )
+        
+        # Precompiled indicator patterns, matched against lowercased text
+        self._deva_re = re.compile(r"[\u0900-\u097F]+")
+        self._hi_roman_re = re.compile(r"\b(hai|hain|ka|ki|ke|mein|se|ko|aur|ya|to|bhi|ab|yah|vah)\b")
+        self._latin_word_re = re.compile(r"\b[a-z]+\b")
+        self._en_func_re = re.compile(r"\b(is|are|was|were|the|and|in|on|at|to|for|of|with)\b")
         
         # Common Hindi words and patterns
         self.hindi_indicators = {
             "words": ["है", "हैं", "का", "की", "के", "में", "से", "को", "और", "या", "तो", "भी", "अब", "यह", "वह"],
             "patterns": [
-                r"[\u0900-\u097F]+",  # Devanagari characters
-                r"\b(hai|hain|ka|ki|ke|mein|se|ko|aur|ya|to|bhi|ab|yah|vah)\b"  # Romanized Hindi
+                self._deva_re,      # Devanagari characters
+                self._hi_roman_re   # Romanized Hindi
             ]
         }
         
@@ -57,11 +154,27 @@ class LanguageDetector:
         self.english_indicators = {
             "words": ["the", "and", "is", "are", "was", "were", "in", "on", "at", "to", "for", "of", "with"],
             "patterns": [
-                r"\b[a-zA-Z]+\b",  # English words
-                r"\b(is|are|was|were|the|and|in|on|at|to|for|of|with)\b"
+                self._latin_word_re,  # English words
+                self._en_func_re
             ]
         }
         
+        # Single-pass indicator word matchers. Hindi words are counted as substrings:
+        # a zero-width lookahead tries the longest word at every position, and each
+        # hit is weighted by how many indicator words it starts with (है inside हैं).
+        hindi_words = sorted(self.hindi_indicators["words"], key=len, reverse=True)
+        self._hi_words_re = re.compile("(?=(" + "|".join(map(re.escape, hindi_words)) + "))")
+        self._hi_word_weights = {
+            word: sum(1 for other in hindi_words if word.startswith(other))
+            for word in hindi_words
+        }
+        # English words are counted as whole whitespace-delimited tokens
+        self._english_words_set = frozenset(self.english_indicators["words"])
+        
+        # Memoize full analyses; detection is a pure function of text + preferences,
+        # and replies/greetings repeat across turns. Cleared when preferences change.
+        self._analyze_text_cached = functools.lru_cache(maxsize=1024)(self._analyze_text_uncached)
+        
         logger.info("Language detector initialized")
 
     def detect_language(self, text: str) -> str:
@@ -84,16 +197,28 @@ class LanguageDetector:
         """Get detailed language detection results"""
         return self._analyze_text(text)
 
+    def detect_many(self, texts: List[str]) -> List[DetectionResult]:
+        """Get detailed detection results for a batch of texts"""
+        cleaned_texts = [self._clean_text(text) if text and text.strip() else "" for text in texts]
+        script_analyses = self._analyze_script_many(cleaned_texts)
+        
+        results = []
+        for text, cleaned_text, script_analysis in zip(texts, cleaned_texts, script_analyses):
+            if not text or not text.strip():
+                results.append(self._empty_result())
+            else:
+                results.append(self._classify(cleaned_text, script_analysis))
+        
+        return results
+
     def _analyze_text(self, text: str) -> DetectionResult:
+        """Perform comprehensive text analysis (cached per text)"""
+        return self._analyze_text_cached(text)
+
+    def _analyze_text_uncached(self, text: str) -> DetectionResult:
         """Perform comprehensive text analysis"""
         if not text or not text.strip():
-            return DetectionResult(
-                primary_language=self.preferences["default_language"],
-                confidence=0.0,
-                script_type="unknown",
-                is_mixed=False,
-                language_distribution={}
-            )
+            return self._empty_result()
         
         # Clean text
         cleaned_text = self._clean_text(text)
@@ -101,11 +226,47 @@ class LanguageDetector:
         # Script analysis
         script_analysis = self._analyze_script(cleaned_text)
         
+        return self._classify(cleaned_text, script_analysis)
+
+    def _empty_result(self) -> DetectionResult:
+        """Detection result for empty or whitespace-only text"""
+        return DetectionResult(
+            primary_language=self.preferences["default_language"],
+            confidence=0.0,
+            script_type="unknown",
+            is_mixed=False,
+            language_distribution={}
+        )
+
+    def _classify(self, cleaned_text: str, script_analysis: Dict[str, float]) -> DetectionResult:
+        """Classify cleaned text given its script composition"""
+        # Unambiguous script: the script weight decides the outcome, skip langdetect
+        if script_analysis["devanagari"] > 0.9:
+            return DetectionResult(
+                primary_language="hi",
+                confidence=script_analysis["devanagari"],
+                script_type="devanagari",
+                is_mixed=False,
+                language_distribution={"hi": 1.0, "en": 0.0}
+            )
+        
+        if script_analysis["latin"] > 0.9:
+            return DetectionResult(
+                primary_language="en",
+                confidence=script_analysis["latin"],
+                script_type="latin",
+                is_mixed=False,
+                language_distribution={"hi": 0.0, "en": 1.0}
+            )
+        
         # Statistical analysis using multiple methods
         statistical_result = self._statistical_analysis(cleaned_text)
         
-        # Pattern-based analysis
-        pattern_result = self._pattern_analysis(cleaned_text)
+        # Pattern-based analysis; near-pure Devanagari cannot match the Latin indicators
+        if script_analysis["devanagari"] > 0.5 and script_analysis["latin"] < 0.05:
+            pattern_result = {"hi": 1.0, "en": 0.0}
+        else:
+            pattern_result = self._pattern_analysis(cleaned_text)
         
         # Combine results
         combined_result = self._combine_analyses(
@@ -116,45 +277,69 @@ class LanguageDetector:
 
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text for analysis"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
-        
         # Remove URLs, emails, and other non-linguistic content
-        text = re.sub(r'http[s]?://\S+|www\.\S+', '', text)
-        text = re.sub(r'\S+@\S+\.\S+', '', text)
-        text = re.sub(r'[^\w\s\u0900-\u097F\u0020-\u007E]', '', text)
+        text = self._noise_strip_re.sub('', text)
         
-        return text.strip()
+        # Remove extra whitespace
+        return self._ws_re.sub(' ', text).strip()
 
     def _analyze_script(self, text: str) -> Dict[str, float]:
         """Analyze script composition of the text"""
+        if NUMPY_AVAILABLE and len(text) > self.numpy_script_min_length:
+            if NUMBA_AVAILABLE:
+                codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+                return self._script_ratios(len(codes), *_count_scripts(codes, self._whitespace_table))
+            return self._analyze_script_many([text])[0]
+        
         total_chars = len(text.replace(' ', ''))
         if total_chars == 0:
             return {"devanagari": 0.0, "latin": 0.0, "other": 0.0}
         
-        devanagari_count = 0
-        latin_count = 0
-        other_count = 0
+        # Classify every character in one C-level pass, then count buckets
+        classified = text.translate(self._script_table)
+        devanagari_count = classified.count("D")
+        latin_count = classified.count("L")
+        other_count = len(classified) - devanagari_count - latin_count
         
-        for char in text:
-            if char.isspace():
-                continue
-                
-            char_code = ord(char)
-            
-            # Check if character is Devanagari
-            is_devanagari = any(
-                start <= char_code <= end 
-                for start, end in self.devanagari_range
-            )
-            
-            if is_devanagari:
-                devanagari_count += 1
-            elif char.isascii() and char.isalpha():
-                latin_count += 1
-            else:
-                other_count += 1
+        return {
+            "devanagari": devanagari_count / total_chars,
+            "latin": latin_count / total_chars,
+            "other": other_count / total_chars
+        }
+
+    def _analyze_script_many(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Vectorized script analysis over a batch of texts"""
+        if not NUMPY_AVAILABLE:
+            return [self._analyze_script(text) for text in texts]
+        
+        # One codepoint array for the whole batch, with a text index per character
+        encoded = [text.encode("utf-32-le", "surrogatepass") for text in texts]
+        lengths = np.fromiter((len(chunk) // 4 for chunk in encoded), dtype=np.int64, count=len(encoded))
+        codes = np.frombuffer(b"".join(encoded), dtype=np.uint32)
+        segments = np.repeat(np.arange(len(texts)), lengths)
+        
+        devanagari_mask = np.zeros(codes.shape, dtype=bool)
+        for start, end in self.devanagari_range:
+            devanagari_mask |= (codes >= start) & (codes <= end)
+        latin_mask = ((codes >= 0x41) & (codes <= 0x5A)) | ((codes >= 0x61) & (codes <= 0x7A))
+        whitespace_mask = np.isin(codes, self._whitespace_codes)
+        
+        # Per-text counts; bincount keeps empty texts at zero
+        counts = [
+            np.bincount(segments[mask], minlength=len(texts)).tolist()
+            for mask in (codes == 0x20, whitespace_mask, devanagari_mask, latin_mask)
+        ]
         
+        return [self._script_ratios(*text_counts) for text_counts in zip(lengths.tolist(), *counts)]
+
+    def _script_ratios(self, length: int, spaces: int, whitespace: int,
+                       devanagari_count: int, latin_count: int) -> Dict[str, float]:
+        """Turn per-text codepoint counts into script ratios"""
+        total_chars = length - spaces
+        if total_chars == 0:
+            return {"devanagari": 0.0, "latin": 0.0, "other": 0.0}
+        
+        other_count = length - whitespace - devanagari_count - latin_count
         return {
             "devanagari": devanagari_count / total_chars,
             "latin": latin_count / total_chars,
@@ -168,8 +353,10 @@ class LanguageDetector:
             return self._fallback_analysis(text)
         
         try:
-            # Get language probabilities
-            langs = detect_langs(text)
+            # Get language probabilities from the subset-profile factory
+            detector = _langdetect_factory().create()
+            detector.append(text)
+            langs = detector.get_probabilities()
             result = {}
             
             for lang_prob in langs:
@@ -202,22 +389,22 @@ class LanguageDetector:
             return {"hi": 0.0, "en": 0.0}
         
         # Check for Hindi indicators
-        for word in self.hindi_indicators["words"]:
-            if word in text_lower:
-                hindi_score += text_lower.count(word)
+        hindi_score += sum(
+            self._hi_word_weights[match.group(1)]
+            for match in self._hi_words_re.finditer(text_lower)
+        )
         
+        # Count matches without materializing match lists
         for pattern in self.hindi_indicators["patterns"]:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            hindi_score += len(matches)
+            hindi_score += sum(1 for _ in pattern.finditer(text_lower))
         
         # Check for English indicators
-        for word in self.english_indicators["words"]:
-            if word in words:
-                english_score += words.count(word)
+        word_counts = Counter(words)
+        english_score += sum(word_counts[word] for word in self._english_words_set)
         
         for pattern in self.english_indicators["patterns"]:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            english_score += len(matches) * 0.5  # Lower weight for common patterns
+            matches = sum(1 for _ in pattern.finditer(text_lower))
+            english_score += matches * 0.5  # Lower weight for common patterns
         
         # Normalize scores
         total_score = hindi_score + english_score
@@ -248,13 +435,6 @@ class LanguageDetector:
                          pattern_result: Dict, text: str) -> DetectionResult:
         """Combine different analysis results into final detection"""
         
-        # Weight different analyses
-        weights = {
-            "script": 0.4,
-            "statistical": 0.4,
-            "pattern": 0.2
-        }
-        
         # Convert script analysis to language probabilities
         script_lang_prob = {}
         if script_analysis["devanagari"] > 0.1:
@@ -269,27 +449,32 @@ class LanguageDetector:
         else:
             script_lang_prob = {"hi": 0.5, "en": 0.5}
         
-        # Combine all analyses
-        combined_scores = {"hi": 0.0, "en": 0.0}
-        
-        for lang in ["hi", "en"]:
-            combined_scores[lang] = (
-                script_lang_prob.get(lang, 0) * weights["script"] +
-                statistical_result.get(lang, 0) * weights["statistical"] +
-                pattern_result.get(lang, 0) * weights["pattern"]
-            )
+        # Combine all analyses as a weighted sum (script, statistical, pattern)
+        script_weight, statistical_weight, pattern_weight = self.analysis_weights
+        hi_score = (
+            script_lang_prob.get("hi", 0) * script_weight +
+            statistical_result.get("hi", 0) * statistical_weight +
+            pattern_result.get("hi", 0) * pattern_weight
+        )
+        en_score = (
+            script_lang_prob.get("en", 0) * script_weight +
+            statistical_result.get("en", 0) * statistical_weight +
+            pattern_result.get("en", 0) * pattern_weight
+        )
         
         # Normalize final scores
-        total_score = sum(combined_scores.values())
+        total_score = hi_score + en_score
         if total_score > 0:
-            combined_scores = {k: v/total_score for k, v in combined_scores.items()}
+            hi_score, en_score = hi_score / total_score, en_score / total_score
+        combined_scores = {"hi": hi_score, "en": en_score}
         
-        # Determine primary language and mixed status
-        primary_lang = max(combined_scores, key=combined_scores.get)
-        confidence = combined_scores[primary_lang]
+        # Determine primary language and mixed status (ties go to Hindi)
+        if hi_score >= en_score:
+            primary_lang, confidence, min_lang_ratio = "hi", hi_score, en_score
+        else:
+            primary_lang, confidence, min_lang_ratio = "en", en_score, hi_score
         
         # Check if text is mixed language
-        min_lang_ratio = min(combined_scores.values())
         is_mixed = min_lang_ratio > self.preferences["mixed_threshold"]
         
         # Determine script type
@@ -320,8 +505,7 @@ class LanguageDetector:
 
     def has_devanagari_script(self, text: str) -> bool:
         """Check if text contains Devanagari script"""
-        script_analysis = self._analyze_script(text)
-        return script_analysis["devanagari"] > 0.0
+        return not self._devanagari_chars.isdisjoint(text)
 
     def get_supported_languages(self) -> List[str]:
         """Get list of supported languages"""
@@ -334,16 +518,27 @@ class LanguageDetector:
     def update_preferences(self, new_preferences: Dict):
         """Update detection preferences"""
         self.preferences.update(new_preferences)
+        self._analyze_text_cached.cache_clear()
         logger.info(f"Updated language detection preferences: {self.preferences}")
 
     def set_default_language(self, lang: str):
         """Set default language for ambiguous cases"""
         if lang in ["hi", "en"]:
             self.preferences["default_language"] = lang
+            self._analyze_text_cached.cache_clear()
             logger.info(f"Set default language to: {lang}")
         else:
             logger.warning(f"Unsupported default language: {lang}")
 
+_detector = None
+
+def get_detector() -> LanguageDetector:
+    """Get the process-wide LanguageDetector instance"""
+    global _detector
+    if _detector is None:
+        _detector = LanguageDetector()
+    return _detector
+
 if __name__ == "__main__":
     # Test the language detector
     detector = LanguageDetector()
@@ -356,8 +551,7 @@ if __name__ == "__main__":
         "यह एक mixed language sentence है।"
     ]
     
-    for text in test_texts:
-        result = detector.detect_detailed(text)
+    for text, result in zip(test_texts, detector.detect_many(test_texts)):
         print(f"\nText: {text}")
         print(f"Primary Language: {result.primary_language}")
         print(f"Confidence: {result.confidence:.2f}")
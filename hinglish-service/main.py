@@ -5,9 +5,12 @@ Main FastAPI application with WebSocket support for real-time audio processing
 """
 
 import asyncio
+import base64
+import io
 import json
 import logging
 import os
+from dataclasses import asdict
 from pathlib import Path
 from typing import Dict, List, Optional
 
@@ -18,9 +21,9 @@ from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
 from audio_pipeline import AudioPipeline
-from language_detector import LanguageDetector
+from language_detector import LanguageDetector, get_detector
 from tts_manager import HinglishTTSManager
-from ollama_client import OllamaClient
+from ollama_client import OllamaClient, close_session
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -126,7 +129,7 @@ async def startup_event():
     
     try:
         # Initialize language detector
-        language_detector = LanguageDetector()
+        language_detector = get_detector()
         logger.info("Language detector initialized")
         
         # Initialize TTS manager
@@ -139,9 +142,15 @@ async def startup_event():
         await audio_pipeline.initialize()
         logger.info("Audio pipeline initialized")
         
-        # Note: Ollama client will be initialized by AudioPipeline when needed
-        ollama_client = None  # Placeholder for global reference
-        logger.info("Ollama client will be initialized on first use")
+        # Initialize Ollama client once and share it with the audio pipeline
+        try:
+            ollama_client = OllamaClient()
+            await ollama_client.initialize()
+            audio_pipeline.ollama_client = ollama_client
+            logger.info("Ollama client initialized")
+        except Exception as e:
+            logger.warning(f"Ollama not available, text responses will use fallback: {e}")
+            ollama_client = None
         
         # Initialize RAG system if vector database exists
         await initialize_rag_system()
@@ -161,6 +170,11 @@ async def shutdown_event():
         await tts_manager.cleanup()
     if audio_pipeline:
         await audio_pipeline.cleanup()
+    if ollama_client:
+        await ollama_client.cleanup()
+    if rag_pipeline:
+        rag_pipeline.close()
+    await close_session()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -197,29 +211,26 @@ async def websocket_endpoint(websocket: WebSocket):
         logger.error(f"WebSocket error: {e}")
         active_connections.remove(websocket)
 
+def encode_audio(audio_bytes: Optional[bytes]) -> Optional[str]:
+    """Base64-encode raw TTS audio at the JSON boundary"""
+    if audio_bytes is None:
+        return None
+    return base64.b64encode(audio_bytes).decode('utf-8')
+
 async def process_audio_message(audio_data: str, conversation_mode: str = "hinglish") -> Dict:
     """Process incoming audio data and return response with TTS"""
     try:
-        # Decode base64 audio and save temporarily
-        import base64
-        audio_bytes = base64.b64decode(audio_data)
-        temp_path = Path("temp") / "input.wav"
-        temp_path.parent.mkdir(exist_ok=True)
-        
-        with open(temp_path, "wb") as f:
-            f.write(audio_bytes)
+        # Decode base64 audio into an in-memory buffer
+        audio_buffer = io.BytesIO(base64.b64decode(audio_data))
         
         # Process through pipeline with conversation mode
-        result = await audio_pipeline.process_audio(str(temp_path), conversation_mode)
-        
-        # Clean up temp file
-        temp_path.unlink(missing_ok=True)
+        result = await audio_pipeline.process_audio(audio_buffer, conversation_mode)
         
         return {
             "type": "audio_response",
             "transcription": result["transcription"],
             "response_text": result["response"],
-            "audio_response": result["audio_base64"],
+            "audio_response": encode_audio(result["audio_bytes"]),
             "detected_language": result["detected_language"],
             "tts_engine": result["tts_engine"]
         }
@@ -234,18 +245,6 @@ async def process_audio_message(audio_data: str, conversation_mode: str = "hingl
 async def process_text_message(text: str, conversation_mode: str = "hinglish") -> Dict:
     """Process text input and return response with TTS"""
     try:
-        # Initialize Ollama client if not available
-        global ollama_client
-        if not ollama_client:
-            from ollama_client import OllamaClient
-            ollama_client = OllamaClient()
-            try:
-                await ollama_client.initialize()
-                logger.info("Ollama client initialized for text processing")
-            except Exception as e:
-                logger.warning(f"Failed to initialize Ollama client: {e}")
-                ollama_client = None
-        
         # Get AI response (with RAG if available)
         if ollama_client:
             try:
@@ -268,8 +267,8 @@ async def process_text_message(text: str, conversation_mode: str = "hinglish") -
             # Fallback response when Ollama is not available
             ai_response = f"Echo: {text} (Ollama not available)"
         
-        # Detect language and generate TTS
-        detected_lang = language_detector.detect_language(ai_response)
+        # Detect language off the event loop and generate TTS
+        detected_lang = await asyncio.to_thread(language_detector.detect_language, ai_response)
         audio_result = await tts_manager.generate_speech(ai_response, detected_lang)
         
         return {
@@ -303,19 +302,12 @@ async def update_config(config: Dict):
 async def upload_audio(file: UploadFile = File(...)):
     """Upload audio file for processing"""
     try:
-        # Save uploaded file
-        temp_path = Path("temp") / file.filename
-        temp_path.parent.mkdir(exist_ok=True)
-        
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Keep the uploaded file in memory
+        audio_buffer = io.BytesIO(await file.read())
         
         # Process audio
-        result = await audio_pipeline.process_audio(str(temp_path))
-        
-        # Clean up
-        temp_path.unlink(missing_ok=True)
+        result = await audio_pipeline.process_audio(audio_buffer)
+        result["audio_base64"] = encode_audio(result.pop("audio_bytes"))
         
         return result
         
@@ -386,6 +378,15 @@ async def rag_status():
             "error": str(e)
         }
 
+@app.post("/detect/batch")
+async def detect_batch(texts: List[str]):
+    """Detect the language of several texts in one call"""
+    if not language_detector:
+        raise HTTPException(status_code=503, detail="Language detector not initialized")
+    
+    results = await asyncio.to_thread(language_detector.detect_many, texts)
+    return {"results": [asdict(result) for result in results]}
+
 @app.get("/config")
 async def get_config():
     """Get current system configuration"""
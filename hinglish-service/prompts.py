@@ -4,6 +4,10 @@ System Prompts for Hinglish Chatbot
 Centralized prompt management for different conversation contexts
 """
 
+import functools
+import re
+from typing import Any, Dict, Final, List
+
 # Core system prompts for different language modes
 SYSTEM_PROMPTS = {
     "hinglish": """You are a warm, conversational AI assistant that communicates naturally in both Hindi and English (Hinglish). You're like a friendly companion who enjoys meaningful conversations and genuinely cares about the user.
@@ -241,58 +245,54 @@ When discussing family relationships and social structure:
 - Acknowledge diverse family structures"""
 }
 
-# Utility functions for prompt management
+# Utility functions for prompt management.
+# The tables are fixed, so results are memoized: repeated calls return the very same
+# string object, keeping the system prompt byte-identical for the LLM's prefix cache.
+@functools.lru_cache(maxsize=None)
 def get_system_prompt(prompt_type: str = "hinglish") -> str:
     """Get system prompt by type"""
     return SYSTEM_PROMPTS.get(prompt_type, SYSTEM_PROMPTS["hinglish"])
 
+@functools.lru_cache(maxsize=None)
 def get_specialized_prompt(scenario: str) -> str:
     """Get specialized prompt for specific scenarios"""
     return SPECIALIZED_PROMPTS.get(scenario, "")
 
+@functools.lru_cache(maxsize=None)
 def get_cultural_prompt(context: str) -> str:
     """Get cultural context prompt"""
     return CULTURAL_PROMPTS.get(context, "")
 
+@functools.lru_cache(maxsize=None)
 def build_custom_prompt(base_type: str = "hinglish", 
                        scenario: str = None, 
                        cultural_context: str = None,
                        additional_instructions: str = None) -> str:
     """Build a custom prompt combining different elements"""
-    prompt_parts = [get_system_prompt(base_type)]
-    
-    if scenario:
-        specialized = get_specialized_prompt(scenario)
-        if specialized:
-            prompt_parts.append(f"\n\nSpecialized context: {specialized}")
-    
-    if cultural_context:
-        cultural = get_cultural_prompt(cultural_context)
-        if cultural:
-            prompt_parts.append(f"\n\nCultural context: {cultural}")
-    
-    if additional_instructions:
-        prompt_parts.append(f"\n\nAdditional instructions: {additional_instructions}")
+    specialized = get_specialized_prompt(scenario) if scenario else ""
+    cultural = get_cultural_prompt(cultural_context) if cultural_context else ""
     
-    return "".join(prompt_parts)
-
-# Quick access to commonly used prompts
-DEFAULT_PROMPT = SYSTEM_PROMPTS["hinglish"]
-HINDI_PROMPT = SYSTEM_PROMPTS["hindi_only"]
-ENGLISH_PROMPT = SYSTEM_PROMPTS["english_only"]
-VOICE_PROMPT = build_custom_prompt("hinglish", "voice_assistant")
-CHAT_PROMPT = build_custom_prompt("hinglish", "casual_chat")
-COUNSELOR_PROMPT = build_custom_prompt("hinglish", "guidance_counselor")
-CONVERSATIONAL_PROMPT = build_custom_prompt("hinglish", "conversational")
-
-# RAG-Enhanced Prompts for document-informed responses
-RAG_ENHANCED_PROMPTS = {
-    "guidance_counselor_rag": """You are a professional guidance counselor with access to authoritative counseling resources and books. You provide evidence-based advice while maintaining your warm, supportive personality.
-
-CONTEXT FROM COUNSELING RESOURCES:
-{retrieved_context}
-
-SOURCES: {source_citations}
+    # Sections are always emitted in the same order
+    specialized_part = f"\n\nSpecialized context: {specialized}" if specialized else ""
+    cultural_part = f"\n\nCultural context: {cultural}" if cultural else ""
+    additional_part = f"\n\nAdditional instructions: {additional_instructions}" if additional_instructions else ""
+    return f"{get_system_prompt(base_type)}{specialized_part}{cultural_part}{additional_part}"
+
+# Quick access to commonly used prompts.
+# These are sent to Ollama, which reuses any matching prompt prefix, so they are kept
+# byte-stable but deliberately not padded to a hosted provider's cache-size boundary.
+DEFAULT_PROMPT: Final[str] = get_system_prompt("hinglish")
+HINDI_PROMPT: Final[str] = get_system_prompt("hindi_only")
+ENGLISH_PROMPT: Final[str] = get_system_prompt("english_only")
+VOICE_PROMPT: Final[str] = build_custom_prompt("hinglish", "voice_assistant")
+CHAT_PROMPT: Final[str] = build_custom_prompt("hinglish", "casual_chat")
+COUNSELOR_PROMPT: Final[str] = build_custom_prompt("hinglish", "guidance_counselor")
+CONVERSATIONAL_PROMPT: Final[str] = build_custom_prompt("hinglish", "conversational")
+
+# RAG-Enhanced Prompts for document-informed responses.
+# Each prompt is a static prefix (identity and guidelines, identical on every call) followed
+# by a dynamic suffix carrying the retrieved context, so the prefix stays cacheable.
+COUNSELOR_RAG_STATIC_PREFIX: Final[str] = """You are a professional guidance counselor with access to authoritative counseling resources and books. You provide evidence-based advice while maintaining your warm, supportive personality.
 
 Your Core Identity and Communication Style:
 - You are a warm, supportive guidance counselor specifically designed to help children and teenagers in rural Indian communities
@@ -315,14 +315,16 @@ Language Style:
 - For mixed language input, respond naturally in the same mixed style
 - Use romanized Hindi when appropriate (jaise ki, aap kaise hain)
 
-Remember: Your goal is to provide both evidence-based guidance from authoritative sources AND maintain the warm, conversational tone that makes students feel comfortable sharing.""",
+Remember: Your goal is to provide both evidence-based guidance from authoritative sources AND maintain the warm, conversational tone that makes students feel comfortable sharing."""
 
-    "general_rag": """You are a helpful AI assistant with access to relevant information from authoritative sources.
+COUNSELOR_RAG_DYNAMIC_SUFFIX: Final[str] = """
 
-RELEVANT INFORMATION:
+CONTEXT FROM COUNSELING RESOURCES:
 {retrieved_context}
 
-SOURCES: {source_citations}
+SOURCES: {source_citations}"""
+
+GENERAL_RAG_STATIC_PREFIX: Final[str] = """You are a helpful AI assistant with access to relevant information from authoritative sources.
 
 Instructions:
 - Use the provided context to inform your response when relevant
@@ -330,13 +332,72 @@ Instructions:
 - If the context doesn't contain relevant information, use your general knowledge
 - Provide accurate, helpful, and well-sourced answers
 - Keep responses concise and focused"""
+
+GENERAL_RAG_DYNAMIC_SUFFIX: Final[str] = """
+
+RELEVANT INFORMATION:
+{retrieved_context}
+
+SOURCES: {source_citations}"""
+
+RAG_ENHANCED_PROMPTS = {
+    "guidance_counselor_rag": COUNSELOR_RAG_STATIC_PREFIX + COUNSELOR_RAG_DYNAMIC_SUFFIX,
+    "general_rag": GENERAL_RAG_STATIC_PREFIX + GENERAL_RAG_DYNAMIC_SUFFIX
 }
 
 # RAG Quick Access Constants
 COUNSELOR_RAG_PROMPT = RAG_ENHANCED_PROMPTS["guidance_counselor_rag"]
 GENERAL_RAG_PROMPT = RAG_ENHANCED_PROMPTS["general_rag"]
 
+RAG_STATIC_PREFIXES = {
+    "guidance_counselor_rag": COUNSELOR_RAG_STATIC_PREFIX,
+    "general_rag": GENERAL_RAG_STATIC_PREFIX
+}
+
+RAG_CONTEXT_TEMPLATES = {
+    "guidance_counselor_rag": COUNSELOR_RAG_DYNAMIC_SUFFIX.lstrip(),
+    "general_rag": GENERAL_RAG_DYNAMIC_SUFFIX.lstrip()
+}
+
+def build_rag_context(rag_type: str, retrieved_context: str, source_citations: str) -> str:
+    """Format retrieved context for its own message, separate from the system prompt"""
+    template = RAG_CONTEXT_TEMPLATES.get(rag_type, RAG_CONTEXT_TEMPLATES["general_rag"])
+    return template.format(retrieved_context=retrieved_context, source_citations=source_citations)
+
+def assemble_messages(system_type: str, retrieved_context: str, user_msg: str,
+                      source_citations: str = "", cache_control: bool = False) -> List[Dict[str, Any]]:
+    """Build chat messages with a byte-identical system prompt and the retrieved context in a separate block.
+    
+    With cache_control=True the messages follow the Anthropic-compatible gateway format: the system
+    prompt is a text block marked as an ephemeral cache breakpoint and the context travels as a user turn.
+    """
+    if system_type in RAG_STATIC_PREFIXES:
+        system_prompt = RAG_STATIC_PREFIXES[system_type]
+        context = build_rag_context(system_type, retrieved_context, source_citations)
+    else:
+        system_prompt = get_system_prompt(system_type)
+        context = f"Context:\n{retrieved_context}"
+    
+    if cache_control:
+        return [
+            {
+                "role": "system",
+                "content": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+            },
+            {"role": "user", "content": context},
+            {"role": "user", "content": user_msg}
+        ]
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": context},
+        {"role": "user", "content": user_msg}
+    ]
+
 # Prompt validation
+# Essential elements, matched case-insensitively without lowercasing a copy of the prompt
+REQUIRED_ELEMENTS_RE = re.compile(r"helpful|assistant", re.IGNORECASE)
+
 def validate_prompt(prompt: str) -> bool:
     """Validate if a prompt is suitable for the chatbot"""
     if not prompt or not isinstance(prompt, str):
@@ -347,8 +408,7 @@ def validate_prompt(prompt: str) -> bool:
         return False
     
     # Check for essential elements
-    required_elements = ["helpful", "assistant"]
-    return any(element in prompt.lower() for element in required_elements)
+    return REQUIRED_ELEMENTS_RE.search(prompt) is not None
 
 # Prompt templates for dynamic generation
 PROMPT_TEMPLATES = {
@@ -6,20 +6,175 @@ for guidance counselor documents.
 """
 
 import os
+import re
+import time
 import logging
 import hashlib
+import functools
+import threading
+import multiprocessing
+import concurrent.futures
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from collections import deque
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from dataclasses import dataclass
 import json
 from datetime import datetime
+from bisect import bisect_right
 
-import pdfplumber
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+def _write_json(path: Path, data: Any) -> None:
+    """Write indented UTF-8 JSON, encoded with orjson when available"""
+    if ORJSON_AVAILABLE:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+def _json_line(data: Any) -> bytes:
+    """Encode one JSON Lines record, including the trailing newline"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data) + b"\n"
+    return json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n"
+
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+def _read_json(path: Path) -> Any:
+    """Read a JSON file, parsing the raw bytes with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) of a PDF (module-level so worker processes can run it)"""
+    import fitz  # PyMuPDF, imported on first use: only ingestion needs it
+    
+    page_texts = []
+    with fitz.open(pdf_path) as doc:
+        for page_index in range(start, stop):
+            try:
+                page_texts.append(doc[page_index].get_text("text"))
+            except Exception as e:
+                logger.warning(f"Could not extract text from page {page_index + 1}: {e}")
+                page_texts.append("")
+    return page_texts
+
+# Separators tried in order when splitting text, coarsest first
+CHUNK_SEPARATORS = ("\n\n", "\n", ". ", "! ", "? ", " ", "")
+
+# Page marker written by extract_text_from_pdf
+PAGE_MARKER_RE = re.compile(r"\[Page (\d+)\]")
+
+class TextChunker:
+    """Recursive separator-based text splitter with precompiled separator patterns.
+    
+    Produces the same chunks as LangChain's RecursiveCharacterTextSplitter (separators
+    kept at the start of the following piece, whitespace stripped) without its overhead.
+    """
+    
+    def __init__(self, chunk_size: int, chunk_overlap: int, separators: tuple = CHUNK_SEPARATORS):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators
+        # Capturing patterns keep each separator so it can be reattached to the next piece
+        self._patterns = tuple(re.compile(f"({re.escape(sep)})") if sep else None for sep in separators)
+    
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks of at most chunk_size characters where possible"""
+        return [chunk for _, chunk in self._split(text, 0, 0)]
+    
+    def split_text_with_offsets(self, text: str) -> List[Tuple[int, str]]:
+        """Split text into (start offset in text, chunk) pairs"""
+        return self._split(text, 0, 0)
+    
+    def _split(self, text: str, level: int, base: int) -> List[Tuple[int, str]]:
+        """Split on the coarsest separator present, recursing into pieces that are still too long"""
+        # Pick the first separator (from this level on) that occurs in the text
+        index = len(self.separators) - 1
+        for i in range(level, len(self.separators)):
+            if not self.separators[i] or self.separators[i] in text:
+                index = i
+                break
+        
+        pattern = self._patterns[index]
+        if pattern is None:
+            pieces = list(text)
+            next_level = None
+        else:
+            parts = pattern.split(text)
+            pieces = [parts[0], *map(str.__add__, parts[1::2], parts[2::2])]
+            next_level = index + 1
+        
+        # Pieces are contiguous, so offsets are running sums of their lengths
+        splits = []
+        offset = base
+        for piece in pieces:
+            if piece:
+                splits.append((offset, piece))
+                offset += len(piece)
+        
+        final_chunks = []
+        good_splits = []
+        for split in splits:
+            if len(split[1]) < self.chunk_size:
+                good_splits.append(split)
+                continue
+            
+            if good_splits:
+                final_chunks.extend(self._merge(good_splits))
+                good_splits = []
+            if next_level is None:
+                final_chunks.append(split)
+            else:
+                final_chunks.extend(self._split(split[1], next_level, split[0]))
+        
+        if good_splits:
+            final_chunks.extend(self._merge(good_splits))
+        return final_chunks
+    
+    def _merge(self, splits: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """Greedily pack pieces into chunks, carrying up to chunk_overlap characters forward"""
+        chunks = []
+        window = deque()
+        total = 0
+        for split in splits:
+            length = len(split[1])
+            if total + length > self.chunk_size and window:
+                chunks.extend(self._join(window))
+                
+                # Drop pieces from the front until only the overlap remains and the next piece fits
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    total -= len(window.popleft()[1])
+            
+            window.append(split)
+            total += length
+        
+        chunks.extend(self._join(window))
+        return chunks
+    
+    @staticmethod
+    def _join(window: deque) -> List[Tuple[int, str]]:
+        """Join a window of pieces into a stripped chunk, or nothing if it is blank"""
+        joined = "".join(piece for _, piece in window)
+        chunk = joined.strip()
+        if not chunk:
+            return []
+        return [(window[0][0] + len(joined) - len(joined.lstrip()), chunk)]
+
+@functools.lru_cache(maxsize=8)
+def get_text_chunker(chunk_size: int, chunk_overlap: int) -> TextChunker:
+    """Shared chunker per (chunk_size, chunk_overlap); TextChunker holds no per-call state"""
+    return TextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
 @dataclass
 class DocumentChunk:
     """Represents a chunk of text from a document"""
@@ -36,19 +191,44 @@ class ProcessedDocument:
     chunks: List[DocumentChunk]
     metadata: Dict[str, Any]
     total_chunks: int
+    
+    def to_columns(self) -> Dict[str, List[Any]]:
+        """Column-oriented view of the chunks, ready for batched embedding"""
+        return chunk_columns(self.chunks)
+
+def chunk_columns(chunks: List[DocumentChunk]) -> Dict[str, List[Any]]:
+    """Reshape chunks into one list per field (ids, texts, metadata) in a single pass"""
+    columns = {"chunk_id": [], "doc_id": [], "text": [], "metadata": []}
+    for chunk in chunks:
+        columns["chunk_id"].append(chunk.chunk_id)
+        columns["doc_id"].append(chunk.doc_id)
+        columns["text"].append(chunk.text)
+        columns["metadata"].append(chunk.metadata)
+    return columns
 
 class DocumentProcessor:
     """Processes PDF documents for RAG system"""
     
-    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 50):
+    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 50, max_workers: Optional[int] = None):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
-        )
+        
+        # Pages are independent, so large PDFs are split across worker processes
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_min_pages = 32
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        
+        # Documents may be processed from several threads at once; this guards the
+        # worker pool and the shared chunk-hash table
+        self._lock = threading.Lock()
+        
+        # Parsed metadata listing, reused while the metadata directory is unchanged
+        self.document_list_ttl = 30.0
+        self._document_list_cache: Optional[Tuple[float, int, List[Dict[str, Any]]]] = None
+        
+        # Document IDs by (path, size, mtime), so an unchanged file is hashed only once
+        self._doc_id_cache: Dict[tuple, str] = {}
+        self.text_splitter = get_text_chunker(chunk_size, chunk_overlap)
         
         # Create necessary directories
         self.base_path = Path("documents")
@@ -58,21 +238,50 @@ class DocumentProcessor:
         
         for path in [self.base_path, self.raw_path, self.processed_path, self.metadata_path]:
             path.mkdir(exist_ok=True)
+        
+        # Content hash -> owning doc_id of every stored chunk, so boilerplate repeated
+        # across documents (cover pages, disclaimers) is stored and embedded only once
+        self.chunk_hashes_file = self.metadata_path / "_chunk_hashes.json"
+        self._seen_hashes: Dict[str, str] = {}
+        if self.chunk_hashes_file.exists():
+            try:
+                self._seen_hashes = _read_json(self.chunk_hashes_file)
+            except Exception as e:
+                logger.warning(f"Could not load chunk hashes from {self.chunk_hashes_file}: {e}")
+    
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """Stable hash of a chunk's text, used for deduplication and as an embedding cache key"""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def release_chunk_hashes(self, doc_id: str) -> None:
+        """Forget the chunk hashes owned by a removed document"""
+        with self._lock:
+            self._seen_hashes = {h: owner for h, owner in self._seen_hashes.items() if owner != doc_id}
+            _write_json(self.chunk_hashes_file, self._seen_hashes)
     
     def generate_doc_id(self, file_path: str) -> str:
         """Generate unique document ID based on file content"""
         try:
-            with open(file_path, 'rb') as f:
-                content = f.read()
-            return hashlib.md5(content).hexdigest()[:12]
+            stat = os.stat(file_path)
+            cache_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+            doc_id = self._doc_id_cache.get(cache_key)
+            if doc_id is None:
+                # Stream the file through the hash instead of reading it into memory
+                digest = hashlib.md5()
+                with open(file_path, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(block)
+                doc_id = digest.hexdigest()[:12]
+                self._doc_id_cache[cache_key] = doc_id
+            return doc_id
         except Exception as e:
             logger.error(f"Error generating doc ID for {file_path}: {e}")
             return hashlib.md5(str(file_path).encode()).hexdigest()[:12]
     
-    def extract_text_from_pdf(self, pdf_path: str) -> tuple[str, Dict[str, Any]]:
-        """Extract text and metadata from PDF"""
+    def extract_text_from_pdf(self, pdf_path: str) -> tuple[str, Dict[str, Any], List[Tuple[int, int]]]:
+        """Extract text, metadata and (char_start, page_number) offsets of each page from PDF"""
         try:
-            full_text = ""
             metadata = {
                 "total_pages": 0,
                 "title": "",
@@ -82,63 +291,126 @@ class DocumentProcessor:
                 "file_size": os.path.getsize(pdf_path)
             }
             
-            with pdfplumber.open(pdf_path) as pdf:
-                metadata["total_pages"] = len(pdf.pages)
+            import fitz  # PyMuPDF, imported on first use: only ingestion needs it
+            
+            with fitz.open(pdf_path) as doc:
+                metadata["total_pages"] = doc.page_count
                 
                 # Extract PDF metadata
-                if pdf.metadata:
+                if doc.metadata:
                     metadata.update({
-                        "title": pdf.metadata.get("Title", ""),
-                        "author": pdf.metadata.get("Author", ""),
-                        "subject": pdf.metadata.get("Subject", ""),
-                        "creator": pdf.metadata.get("Creator", "")
+                        "title": doc.metadata.get("title") or "",
+                        "author": doc.metadata.get("author") or "",
+                        "subject": doc.metadata.get("subject") or "",
+                        "creator": doc.metadata.get("creator") or ""
                     })
-                
-                # Extract text from all pages
-                for page_num, page in enumerate(pdf.pages, 1):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text:
-                            full_text += f"\n[Page {page_num}]\n{page_text}\n"
-                    except Exception as e:
-                        logger.warning(f"Could not extract text from page {page_num}: {e}")
-                        continue
+            
+            # Extract text from all pages, noting where each page's marker starts
+            page_blocks = []
+            page_offsets = []
+            position = 0
+            for page_num, page_text in enumerate(self._extract_pages(pdf_path, metadata["total_pages"]), 1):
+                if page_text:
+                    block = f"\n[Page {page_num}]\n{page_text}\n"
+                    page_offsets.append((position, page_num))
+                    page_blocks.append(block)
+                    position += len(block)
+            full_text = "".join(page_blocks)
+            
+            # Offsets must index the stripped text that is returned
+            leading = len(full_text) - len(full_text.lstrip())
+            page_offsets = [(max(0, start - leading), page_num) for start, page_num in page_offsets]
             
             # Fallback title from filename if not in metadata
             if not metadata["title"]:
                 metadata["title"] = Path(pdf_path).stem.replace("_", " ").title()
             
-            return full_text.strip(), metadata
+            return full_text.strip(), metadata, page_offsets
             
         except Exception as e:
             logger.error(f"Error extracting text from PDF {pdf_path}: {e}")
             raise
     
-    def create_chunks(self, text: str, doc_metadata: Dict[str, Any], doc_id: str) -> List[DocumentChunk]:
+    def _extract_pages(self, pdf_path: str, total_pages: int) -> List[str]:
+        """Extract page texts in order, fanning page ranges out to the process pool for large PDFs"""
+        if total_pages < self.parallel_min_pages or self.max_workers < 2:
+            return _extract_page_range(pdf_path, 0, total_pages)
+        
+        # Concurrent ingestions share one pool; take a local reference under the
+        # lock so a concurrent close() can't swap it out between the check and submit
+        with self._lock:
+            if self._pool is None:
+                # Spawn, not fork: this process already runs torch, asyncio and executor
+                # threads, and forking a multi-threaded process can deadlock the child
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            pool = self._pool
+        
+        # One contiguous range per worker, so each process opens the file only once
+        step = -(-total_pages // self.max_workers)
+        futures = [
+            pool.submit(_extract_page_range, pdf_path, start, min(start + step, total_pages))
+            for start in range(0, total_pages, step)
+        ]
+        return [page_text for future in futures for page_text in future.result()]
+    
+    def close(self) -> None:
+        """Shut down the extraction worker processes"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+    
+    def create_chunks(
+        self,
+        text: str,
+        doc_metadata: Dict[str, Any],
+        doc_id: str,
+        page_offsets: Optional[List[Tuple[int, int]]] = None
+    ) -> List[DocumentChunk]:
         """Split text into chunks with metadata"""
         try:
-            # Split text into chunks
-            text_chunks = self.text_splitter.split_text(text)
+            # Split text into chunks, keeping each chunk's start offset
+            text_chunks = self.text_splitter.split_text_with_offsets(text)
+            page_starts = [start for start, _ in page_offsets] if page_offsets else None
             
             chunks = []
-            for i, chunk_text in enumerate(text_chunks):
-                # Extract page number from chunk if available
+            doc_hashes = set()
+            duplicates = 0
+            for i, (chunk_start, chunk_text) in enumerate(text_chunks):
+                # Skip text already stored for another document, or earlier in this one.
+                # setdefault claims the hash atomically, so concurrently processed
+                # documents cannot both keep the same chunk
+                text_hash = self.content_hash(chunk_text.strip())
+                owner = self._seen_hashes.setdefault(text_hash, doc_id)
+                if text_hash in doc_hashes or owner != doc_id:
+                    duplicates += 1
+                    continue
+                doc_hashes.add(text_hash)
+                
+                # Page the chunk starts on, by binary search over the page start offsets
                 page_match = None
-                lines = chunk_text.split('\n')
-                for line in lines[:3]:  # Check first few lines
-                    if line.startswith('[Page ') and ']' in line:
-                        try:
-                            page_match = int(line.split('[Page ')[1].split(']')[0])
+                if page_starts is not None:
+                    page_index = bisect_right(page_starts, chunk_start) - 1
+                    if page_index >= 0:
+                        page_match = page_offsets[page_index][1]
+                else:
+                    # No offsets given: fall back to a page marker in the first few lines
+                    for line in chunk_text.split('\n', 3)[:3]:
+                        match = PAGE_MARKER_RE.match(line)
+                        if match:
+                            page_match = int(match.group(1))
                             break
-                        except:
-                            pass
                 
                 chunk_metadata = {
                     **doc_metadata,
                     "chunk_index": i,
                     "chunk_size": len(chunk_text),
                     "page_number": page_match,
-                    "doc_id": doc_id
+                    "doc_id": doc_id,
+                    "content_hash": text_hash
                 }
                 
                 chunk_id = f"{doc_id}_chunk_{i:04d}"
@@ -151,6 +423,9 @@ class DocumentProcessor:
                 )
                 chunks.append(chunk)
             
+            if duplicates:
+                logger.info(f"Skipped {duplicates} duplicate chunks in document {doc_id}")
+            
             return chunks
             
         except Exception as e:
@@ -160,19 +435,15 @@ class DocumentProcessor:
     def save_processed_document(self, processed_doc: ProcessedDocument) -> None:
         """Save processed document and metadata to disk"""
         try:
-            # Save chunks
-            chunks_file = self.processed_path / f"{processed_doc.doc_id}_chunks.json"
-            chunks_data = [
-                {
-                    "chunk_id": chunk.chunk_id,
-                    "text": chunk.text,
-                    "metadata": chunk.metadata
-                }
-                for chunk in processed_doc.chunks
-            ]
-            
-            with open(chunks_file, 'w', encoding='utf-8') as f:
-                json.dump(chunks_data, f, indent=2, ensure_ascii=False)
+            # Save chunks as JSON Lines, one record at a time
+            chunks_file = self.processed_path / f"{processed_doc.doc_id}_chunks.jsonl"
+            with open(chunks_file, 'wb') as f:
+                for chunk in processed_doc.chunks:
+                    f.write(_json_line({
+                        "chunk_id": chunk.chunk_id,
+                        "text": chunk.text,
+                        "metadata": chunk.metadata
+                    }))
             
             # Save document metadata
             metadata_file = self.metadata_path / f"{processed_doc.doc_id}_metadata.json"
@@ -186,8 +457,10 @@ class DocumentProcessor:
                 "chunk_overlap": self.chunk_overlap
             }
             
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(doc_metadata, f, indent=2, ensure_ascii=False)
+            _write_json(metadata_file, doc_metadata)
+            self._document_list_cache = None
+            with self._lock:
+                _write_json(self.chunk_hashes_file, self._seen_hashes)
                 
             logger.info(f"Saved processed document {processed_doc.doc_id} with {processed_doc.total_chunks} chunks")
             
@@ -204,7 +477,7 @@ class DocumentProcessor:
             doc_id = self.generate_doc_id(pdf_path)
             
             # Extract text and metadata
-            text, metadata = self.extract_text_from_pdf(pdf_path)
+            text, metadata, page_offsets = self.extract_text_from_pdf(pdf_path)
             
             if not text.strip():
                 raise ValueError(f"No text could be extracted from PDF: {pdf_path}")
@@ -213,7 +486,7 @@ class DocumentProcessor:
             title = title_override or metadata.get("title", Path(pdf_path).stem)
             
             # Create chunks
-            chunks = self.create_chunks(text, metadata, doc_id)
+            chunks = self.create_chunks(text, metadata, doc_id, page_offsets)
             
             if not chunks:
                 raise ValueError(f"No chunks created from PDF: {pdf_path}")
@@ -245,27 +518,13 @@ class DocumentProcessor:
             if not metadata_file.exists():
                 return None
                 
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                doc_metadata = json.load(f)
+            doc_metadata = _read_json(metadata_file)
             
             # Load chunks
-            chunks_file = self.processed_path / f"{doc_id}_chunks.json"
-            if not chunks_file.exists():
+            if not self.has_chunks(doc_id):
                 return None
                 
-            with open(chunks_file, 'r', encoding='utf-8') as f:
-                chunks_data = json.load(f)
-            
-            # Reconstruct chunks
-            chunks = [
-                DocumentChunk(
-                    text=chunk_data["text"],
-                    metadata=chunk_data["metadata"],
-                    chunk_id=chunk_data["chunk_id"],
-                    doc_id=doc_id
-                )
-                for chunk_data in chunks_data
-            ]
+            chunks = list(self.iter_chunks(doc_id))
             
             return ProcessedDocument(
                 doc_id=doc_id,
@@ -279,20 +538,60 @@ class DocumentProcessor:
             logger.error(f"Error loading processed document {doc_id}: {e}")
             return None
     
+    def has_chunks(self, doc_id: str) -> bool:
+        """Whether chunks were saved for a document (current JSONL or legacy JSON format)"""
+        return (
+            (self.processed_path / f"{doc_id}_chunks.jsonl").exists()
+            or (self.processed_path / f"{doc_id}_chunks.json").exists()
+        )
+    
+    def _iter_chunk_records(self, doc_id: str) -> Iterator[Dict[str, Any]]:
+        """Yield raw chunk records, one line at a time for the JSONL format"""
+        chunks_file = self.processed_path / f"{doc_id}_chunks.jsonl"
+        if chunks_file.exists():
+            with open(chunks_file, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        yield _json_loads(line)
+            return
+        
+        # Documents processed before the JSONL format hold a single JSON array
+        legacy_file = self.processed_path / f"{doc_id}_chunks.json"
+        if legacy_file.exists():
+            yield from _read_json(legacy_file)
+    
+    def iter_chunks(self, doc_id: str) -> Iterator[DocumentChunk]:
+        """Stream a processed document's chunks from disk without loading the whole file"""
+        for chunk_data in self._iter_chunk_records(doc_id):
+            yield DocumentChunk(
+                text=chunk_data["text"],
+                metadata=chunk_data["metadata"],
+                chunk_id=chunk_data["chunk_id"],
+                doc_id=doc_id
+            )
+    
     def list_processed_documents(self) -> List[Dict[str, Any]]:
         """List all processed documents"""
         try:
+            # Adding or deleting a metadata file changes the directory mtime; the TTL
+            # covers in-place rewrites made by another process
+            dir_mtime = self.metadata_path.stat().st_mtime_ns
+            cached = self._document_list_cache
+            if cached is not None and cached[1] == dir_mtime and time.monotonic() - cached[0] < self.document_list_ttl:
+                return list(cached[2])
+            
             documents = []
             for metadata_file in self.metadata_path.glob("*_metadata.json"):
                 try:
-                    with open(metadata_file, 'r', encoding='utf-8') as f:
-                        doc_metadata = json.load(f)
+                    doc_metadata = _read_json(metadata_file)
                     documents.append(doc_metadata)
                 except Exception as e:
                     logger.warning(f"Could not load metadata from {metadata_file}: {e}")
                     continue
             
-            return sorted(documents, key=lambda x: x.get("processed_at", ""))
+            documents.sort(key=lambda x: x.get("processed_at", ""))
+            self._document_list_cache = (time.monotonic(), dir_mtime, documents)
+            return list(documents)
             
         except Exception as e:
             logger.error(f"Error listing processed documents: {e}")
@@ -0,0 +1,78 @@
+"""
+Int8 scalar quantization for the in-memory embedding scan
+
+Stores corpus embeddings as int8 codes with per-dimension scale/offset and
+scores queries with an int8 dot product, dequantizing only the final scores
+"""
+
+import logging
+from typing import Optional
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Block of rows widened to float32 at a time when numba is not installed
+SCORE_BLOCK_ROWS = 8192
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _int8_dot(codes, query_codes):
+        rows, dims = codes.shape
+        out = np.empty(rows, dtype=np.int32)
+        for i in prange(rows):
+            acc = 0
+            for j in range(dims):
+                acc += np.int32(codes[i, j]) * np.int32(query_codes[j])
+            out[i] = acc
+        return out
+
+def _int8_dot_numpy(codes: np.ndarray, query_codes: np.ndarray) -> np.ndarray:
+    """Blocked fallback; exact for int8 inputs since every partial sum fits in float32"""
+    query = query_codes.astype(np.float32)
+    out = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], SCORE_BLOCK_ROWS):
+        block = codes[start:start + SCORE_BLOCK_ROWS]
+        out[start:start + len(block)] = block.astype(np.float32) @ query
+    return out
+
+class ScalarQuantizer:
+    """Per-dimension int8 quantizer fitted on the corpus"""
+    
+    def __init__(self, quantile: float = 0.99):
+        self.quantile = quantile
+        self.scale: Optional[np.ndarray] = None
+        self.offset: Optional[np.ndarray] = None
+    
+    def fit(self, embeddings: np.ndarray) -> "ScalarQuantizer":
+        """Clip each dimension to its central quantile range and map it onto [-127, 127]"""
+        tail = (1.0 - self.quantile) / 2
+        low = np.quantile(embeddings, tail, axis=0)
+        high = np.quantile(embeddings, 1.0 - tail, axis=0)
+        self.offset = ((high + low) / 2).astype(np.float32)
+        self.scale = np.maximum((high - low) / 254, 1e-8).astype(np.float32)
+        return self
+    
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        """Quantize corpus rows to int8 codes"""
+        codes = np.rint((embeddings - self.offset) / self.scale)
+        return np.clip(codes, -127, 127).astype(np.int8)
+    
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate query·row for every row, up to a constant shared by all rows"""
+        # query·x = Σ (q_d·s_d)·c_d + Σ q_d·o_d; the second sum is the same for every row
+        weighted = np.asarray(query, dtype=np.float32) * self.scale
+        query_scale = max(float(np.abs(weighted).max()) / 127, 1e-12)
+        query_codes = np.clip(np.rint(weighted / query_scale), -127, 127).astype(np.int8)
+        
+        if NUMBA_AVAILABLE:
+            raw = _int8_dot(codes, query_codes)
+        else:
+            raw = _int8_dot_numpy(codes, query_codes)
+        return raw.astype(np.float32) * query_scale
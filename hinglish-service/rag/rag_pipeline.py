@@ -4,8 +4,10 @@ RAG Pipeline for Guidance Counselor Chatbot
 Main orchestration class that combines document processing, vector storage, and retrieval
 """
 
+import os
 import logging
 import asyncio
+import concurrent.futures
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import json
@@ -54,6 +56,14 @@ class RAGPipeline:
             "default_k": default_k
         }
         
+        # PDF parsing and embedding block, so ingestion runs on worker threads;
+        # large PDFs additionally fan their pages out to the processor's process pool
+        self.max_concurrent_documents = os.cpu_count() or 1
+        self._ingest_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_concurrent_documents,
+            thread_name_prefix="rag-ingest"
+        )
+        
         logger.info("RAG Pipeline initialized successfully")
     
     async def add_document(
@@ -70,40 +80,18 @@ class RAGPipeline:
             if not Path(pdf_path).exists():
                 raise FileNotFoundError(f"PDF file not found: {pdf_path}")
             
-            # Generate document ID
-            doc_id = self.document_processor.generate_doc_id(pdf_path)
-            
-            # Check if already processed (unless force reprocess)
-            if not force_reprocess:
-                existing_doc = self.document_processor.load_processed_document(doc_id)
-                if existing_doc:
-                    logger.info(f"Document {doc_id} already processed, skipping...")
-                    return {
-                        "success": True,
-                        "doc_id": doc_id,
-                        "title": existing_doc.title,
-                        "chunks": existing_doc.total_chunks,
-                        "status": "already_exists"
-                    }
-            
-            # Process document
-            processed_doc = self.document_processor.process_pdf(
-                pdf_path=pdf_path,
-                title_override=title_override
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._ingest_executor,
+                self._ingest_document,
+                pdf_path,
+                title_override,
+                force_reprocess
             )
+            if result["status"] == "processed":
+                self.retriever.clear_cache()
             
-            # Add chunks to vector store
-            self.vector_store.add_chunks(processed_doc.chunks)
-            
-            logger.info(f"Successfully added document {doc_id} with {processed_doc.total_chunks} chunks")
-            
-            return {
-                "success": True,
-                "doc_id": processed_doc.doc_id,
-                "title": processed_doc.title,
-                "chunks": processed_doc.total_chunks,
-                "status": "processed"
-            }
+            return result
             
         except Exception as e:
             logger.error(f"Error adding document {pdf_path}: {e}")
@@ -113,6 +101,48 @@ class RAGPipeline:
                 "pdf_path": pdf_path
             }
     
+    def _ingest_document(
+        self,
+        pdf_path: str,
+        title_override: Optional[str],
+        force_reprocess: bool
+    ) -> Dict[str, Any]:
+        """Blocking part of add_document: parse, chunk, embed and store one PDF"""
+        # Generate document ID
+        doc_id = self.document_processor.generate_doc_id(pdf_path)
+        
+        # Check if already processed (unless force reprocess)
+        if not force_reprocess:
+            existing_doc = self.document_processor.load_processed_document(doc_id)
+            if existing_doc:
+                logger.info(f"Document {doc_id} already processed, skipping...")
+                return {
+                    "success": True,
+                    "doc_id": doc_id,
+                    "title": existing_doc.title,
+                    "chunks": existing_doc.total_chunks,
+                    "status": "already_exists"
+                }
+        
+        # Process document
+        processed_doc = self.document_processor.process_pdf(
+            pdf_path=pdf_path,
+            title_override=title_override
+        )
+        
+        # Add chunks to vector store
+        self.vector_store.add_chunks(processed_doc.chunks)
+        
+        logger.info(f"Successfully added document {doc_id} with {processed_doc.total_chunks} chunks")
+        
+        return {
+            "success": True,
+            "doc_id": processed_doc.doc_id,
+            "title": processed_doc.title,
+            "chunks": processed_doc.total_chunks,
+            "status": "processed"
+        }
+    
     async def add_documents_batch(
         self, 
         pdf_paths: List[str], 
@@ -122,21 +152,20 @@ class RAGPipeline:
         try:
             logger.info(f"Processing batch of {len(pdf_paths)} documents")
             
-            results = []
-            successful = 0
-            failed = 0
-            
-            for pdf_path in pdf_paths:
-                result = await self.add_document(
-                    pdf_path=pdf_path,
-                    force_reprocess=force_reprocess
-                )
-                results.append(result)
-                
-                if result["success"]:
-                    successful += 1
-                else:
-                    failed += 1
+            # Documents are ingested concurrently, at most one per CPU at a time
+            semaphore = asyncio.Semaphore(self.max_concurrent_documents)
+            
+            async def _run(pdf_path: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self.add_document(
+                        pdf_path=pdf_path,
+                        force_reprocess=force_reprocess
+                    )
+            
+            # add_document reports its own failures, so gather never raises here
+            results = await asyncio.gather(*(_run(pdf_path) for pdf_path in pdf_paths))
+            successful = sum(1 for result in results if result["success"])
+            failed = len(results) - successful
             
             return {
                 "total_documents": len(pdf_paths),
@@ -211,20 +240,28 @@ class RAGPipeline:
             
             # Remove from vector store
             chunks_deleted = self.vector_store.delete_document(doc_id)
+            self.retriever.clear_cache()
+            
+            # Its chunk texts are no longer stored, so they may be ingested again
+            self.document_processor.release_chunk_hashes(doc_id)
             
             # Remove processed files
             base_path = Path("documents")
             metadata_file = base_path / "metadata" / f"{doc_id}_metadata.json"
-            chunks_file = base_path / "processed" / f"{doc_id}_chunks.json"
+            chunks_files = [
+                base_path / "processed" / f"{doc_id}_chunks.jsonl",
+                base_path / "processed" / f"{doc_id}_chunks.json"  # legacy format
+            ]
             
             files_deleted = 0
             if metadata_file.exists():
                 metadata_file.unlink()
                 files_deleted += 1
             
-            if chunks_file.exists():
-                chunks_file.unlink()
-                files_deleted += 1
+            for chunks_file in chunks_files:
+                if chunks_file.exists():
+                    chunks_file.unlink()
+                    files_deleted += 1
             
             logger.info(f"Removed document {doc_id}: {chunks_deleted} chunks, {files_deleted} files")
             
@@ -243,14 +280,21 @@ class RAGPipeline:
                 "error": str(e)
             }
     
-    def get_system_stats(self) -> Dict[str, Any]:
-        """Get comprehensive system statistics"""
+    def get_system_stats(
+        self,
+        documents: Optional[List[Dict[str, Any]]] = None,
+        vector_stats: Optional[Dict[str, Any]] = None,
+        vector_health: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Get comprehensive system statistics; pre-fetched backend reads may be passed in"""
         try:
             # Vector store stats
-            vector_stats = self.vector_store.get_collection_stats()
+            if vector_stats is None:
+                vector_stats = self.vector_store.get_collection_stats()
             
             # Document processor stats
-            documents = self.document_processor.list_processed_documents()
+            if documents is None:
+                documents = self.document_processor.list_processed_documents()
             
             # Calculate document statistics
             total_pages = sum(doc.get("metadata", {}).get("total_pages", 0) for doc in documents)
@@ -265,21 +309,27 @@ class RAGPipeline:
                     "documents_list": documents
                 },
                 "configuration": self.config,
-                "system_health": self.health_check()
+                "system_health": self.health_check(documents=documents, vector_health=vector_health)
             }
             
         except Exception as e:
             logger.error(f"Error getting system stats: {e}")
             return {"error": str(e)}
     
-    def health_check(self) -> Dict[str, Any]:
+    def health_check(
+        self,
+        documents: Optional[List[Dict[str, Any]]] = None,
+        vector_health: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """Perform system health check"""
         try:
             # Check vector store health
-            vector_health = self.vector_store.health_check()
+            if vector_health is None:
+                vector_health = self.vector_store.health_check()
             
             # Check document processor
-            documents = self.document_processor.list_processed_documents()
+            if documents is None:
+                documents = self.document_processor.list_processed_documents()
             doc_processor_healthy = len(documents) >= 0  # Basic check
             
             # Overall system health
@@ -321,11 +371,13 @@ class RAGPipeline:
             # Test retrieval
             retrieval_results = await self.retriever.test_retrieval(test_queries)
             
-            # Test vector store
+            # Read each backend once; stats and health reuse these results
             vector_health = self.vector_store.health_check()
-            
-            # System stats
-            stats = self.get_system_stats()
+            stats = self.get_system_stats(
+                documents=self.document_processor.list_processed_documents(),
+                vector_stats=self.vector_store.get_collection_stats(),
+                vector_health=vector_health
+            )
             
             return {
                 "test_status": "completed",
@@ -423,4 +475,9 @@ class RAGPipeline:
                 "successful": 0,
                 "failed": 0,
                 "error": str(e)
-            } 
\ No newline at end of file
+            } 
+    
+    def close(self) -> None:
+        """Shut down the ingestion threads and the PDF extraction worker processes"""
+        self._ingest_executor.shutdown(wait=False, cancel_futures=True)
+        self.document_processor.close()
\ No newline at end of file
@@ -4,14 +4,95 @@ RAG Retriever for Guidance Counselor Chatbot
 Handles query processing, context retrieval, and result ranking
 """
 
+import functools
+import io
 import logging
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+import re
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, replace
 
-from .vector_store import VectorStore
+import numpy as np
+
+from .vector_store import VectorStore, ranking_features, source_label
 
 logger = logging.getLogger(__name__)
 
+# Keyword groups used to classify queries; matching is plain substring search
+QUERY_KEYWORD_GROUPS = {
+    "guidance": (
+        "study", "career", "college", "exam", "stress", "anxiety",
+        "family", "friends", "future", "job", "course", "subject"
+    ),
+    "high_school": ("high school", "12th", "class 12", "senior"),
+    "college": ("college", "university", "undergraduate"),
+    "career": ("career", "job", "profession", "work"),
+    "academic": ("study", "exam", "academic", "learning"),
+    "emotional": ("stress", "anxiety", "mental", "emotional"),
+}
+
+# Metadata filter rules: for each field, the first keyword group present picks the value
+FILTER_RULES = (
+    ("grade_level", (("high_school", "high_school"), ("college", "college"))),
+    ("topic", (
+        ("career", "career_guidance"),
+        ("academic", "academic_support"),
+        ("emotional", "emotional_support")
+    )),
+)
+
+def _build_keyword_matcher():
+    """Compile every keyword into one pattern and map each keyword to its groups"""
+    keyword_tags: Dict[str, set] = {}
+    for tag, keywords in QUERY_KEYWORD_GROUPS.items():
+        for keyword in keywords:
+            keyword_tags.setdefault(keyword, set()).add(tag)
+    
+    # Only one alternative is reported per start position, so a longer keyword also
+    # carries the groups of any keyword that is its prefix
+    for keyword, tags in keyword_tags.items():
+        for other, other_tags in keyword_tags.items():
+            if other != keyword and keyword.startswith(other):
+                tags |= other_tags
+    
+    alternatives = "|".join(re.escape(k) for k in sorted(keyword_tags, key=len, reverse=True))
+    # Zero-width lookahead tries every position, so overlapping keywords are all seen
+    pattern = re.compile(f"(?=({alternatives}))")
+    return pattern, {k: frozenset(v) for k, v in keyword_tags.items()}
+
+_KEYWORD_PATTERN, _KEYWORD_TAGS = _build_keyword_matcher()
+
+@functools.lru_cache(maxsize=1024)
+def _keyword_groups(text_lower: str) -> frozenset:
+    """Groups whose keywords occur in the lowercased text, found in one regex pass"""
+    tags = set()
+    for match in _KEYWORD_PATTERN.finditer(text_lower):
+        tags |= _KEYWORD_TAGS[match.group(1)]
+    return frozenset(tags)
+
+def _compile_filter(rules=FILTER_RULES):
+    """Resolve the filter rules into one lookup from keyword-group set to filter items"""
+    @functools.lru_cache(maxsize=1024)
+    def filter_items(groups: frozenset) -> Tuple[Tuple[str, str], ...]:
+        items = []
+        for field, options in rules:
+            for tag, value in options:
+                if tag in groups:
+                    items.append((field, value))
+                    break
+        return tuple(items)
+    
+    def filter_fn(query_lower: str) -> Optional[Dict[str, Any]]:
+        items = filter_items(_keyword_groups(query_lower))
+        return dict(items) if items else None
+    
+    return filter_fn
+
+@functools.lru_cache(maxsize=4096)
+def _chunk_terms(text: str) -> frozenset:
+    """Lowercased word set of a chunk; the same chunks come back for many queries"""
+    return frozenset(text.lower().split())
+
 @dataclass
 class RetrievalResult:
     """Represents a retrieval result with context and metadata"""
@@ -21,6 +102,119 @@ class RetrievalResult:
     avg_similarity: float
     sources: List[str]
 
+def _clone_result(result: RetrievalResult) -> RetrievalResult:
+    """Copy a result so callers can trim chunk metadata without touching the cached one"""
+    return replace(
+        result,
+        source_chunks=[dict(chunk) for chunk in result.source_chunks],
+        sources=list(result.sources)
+    )
+
+class SemanticQueryCache:
+    """LRU cache of retrieval results looked up by query-embedding similarity"""
+    
+    def __init__(
+        self,
+        max_size: int = 512,
+        similarity_threshold: float = 0.95,
+        num_tables: int = 8,
+        num_bits: int = 8,
+        seed: int = 0
+    ):
+        self.max_size = max_size
+        self.similarity_threshold = similarity_threshold
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self._rng = np.random.default_rng(seed)
+        self._planes: Optional[np.ndarray] = None  # (tables * bits, dim), created on first insert
+        self._bit_weights = 1 << np.arange(num_bits, dtype=np.int64)
+        self._tables: List[Dict[int, set]] = [{} for _ in range(num_tables)]
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, Tuple, List[int], RetrievalResult]]" = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def _bucket_keys(self, vector: np.ndarray) -> List[int]:
+        """Random-hyperplane signature of the vector, one integer key per table"""
+        if self._planes is None:
+            self._planes = self._rng.standard_normal(
+                (self.num_tables * self.num_bits, vector.shape[0])
+            ).astype(np.float32)
+        bits = (self._planes @ vector > 0).reshape(self.num_tables, self.num_bits)
+        return (bits @ self._bit_weights).tolist()
+    
+    def get(self, embedding, scope: Tuple) -> Optional[RetrievalResult]:
+        """Return a copy of the cached result for a near-identical query in the same scope"""
+        if not self._entries:
+            self.misses += 1
+            return None
+        
+        vector = self._normalize(embedding)
+        candidates = set()
+        for table, key in zip(self._tables, self._bucket_keys(vector)):
+            candidates.update(table.get(key, ()))
+        
+        best_id, best_similarity = None, self.similarity_threshold
+        for entry_id in candidates:
+            entry_vector, entry_scope, _, _ = self._entries[entry_id]
+            if entry_scope != scope:
+                continue
+            similarity = float(entry_vector @ vector)
+            if similarity >= best_similarity:
+                best_id, best_similarity = entry_id, similarity
+        
+        if best_id is None:
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(best_id)
+        self.hits += 1
+        return _clone_result(self._entries[best_id][3])
+    
+    def put(self, embedding, scope: Tuple, result: RetrievalResult) -> None:
+        """Store a copy of the result under the query embedding"""
+        vector = self._normalize(embedding)
+        keys = self._bucket_keys(vector)
+        entry_id = self._next_id
+        self._next_id += 1
+        
+        self._entries[entry_id] = (vector, scope, keys, _clone_result(result))
+        for table, key in zip(self._tables, keys):
+            table.setdefault(key, set()).add(entry_id)
+        
+        while len(self._entries) > self.max_size:
+            self._evict(next(iter(self._entries)))
+    
+    def _evict(self, entry_id: int) -> None:
+        _, _, keys, _ = self._entries.pop(entry_id)
+        for table, key in zip(self._tables, keys):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[key]
+    
+    def clear(self) -> None:
+        """Drop all entries (hyperplanes are kept so signatures stay comparable)"""
+        self._entries.clear()
+        for table in self._tables:
+            table.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
 class RAGRetriever:
     """Retrieves relevant context for user queries"""
     
@@ -29,26 +223,42 @@ class RAGRetriever:
         vector_store: VectorStore,
         default_k: int = 3,
         similarity_threshold: float = 0.7,
-        max_context_length: int = 2000
+        max_context_length: int = 2000,
+        semantic_cache_size: int = 512,
+        semantic_cache_threshold: float = 0.95
     ):
         self.vector_store = vector_store
         self.default_k = default_k
         self.similarity_threshold = similarity_threshold
         self.max_context_length = max_context_length
+        
+        # Grade-level/topic filter rules are resolved once, not re-checked per query
+        self._filter_fn = _compile_filter()
+        
+        # Near-duplicate questions reuse an earlier result instead of searching again
+        self.semantic_cache = SemanticQueryCache(
+            max_size=semantic_cache_size,
+            similarity_threshold=semantic_cache_threshold
+        )
+        
+        # Bumped on every invalidation so caches kept by callers can key on it
+        self.cache_version = 0
+    
+    def clear_cache(self) -> None:
+        """Forget cached retrievals, e.g. after the document set changes"""
+        self.semantic_cache.clear()
+        self.cache_version += 1
     
-    def _preprocess_query(self, query: str) -> str:
+    def _preprocess_query(self, query: str, query_lower: Optional[str] = None) -> str:
         """Preprocess the query for better retrieval"""
+        if query_lower is None:
+            query_lower = query.lower()
+        
         # Remove extra whitespace and normalize
         query = " ".join(query.strip().split())
         
         # Add context hints for better retrieval
-        guidance_keywords = [
-            "study", "career", "college", "exam", "stress", "anxiety",
-            "family", "friends", "future", "job", "course", "subject"
-        ]
-        
-        query_lower = query.lower()
-        has_guidance_context = any(keyword in query_lower for keyword in guidance_keywords)
+        has_guidance_context = "guidance" in _keyword_groups(" ".join(query_lower.split()))
         
         if not has_guidance_context:
             # Add guidance context to generic queries
@@ -56,58 +266,37 @@ class RAGRetriever:
         
         return query
     
-    def _create_metadata_filter(self, query: str) -> Optional[Dict[str, Any]]:
+    def _create_metadata_filter(self, query: str, query_lower: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Create metadata filter based on query content"""
-        query_lower = query.lower()
-        
-        # Topic-based filtering
-        filters = {}
-        
-        # Age/Grade level filtering
-        if any(term in query_lower for term in ["high school", "12th", "class 12", "senior"]):
-            filters["grade_level"] = "high_school"
-        elif any(term in query_lower for term in ["college", "university", "undergraduate"]):
-            filters["grade_level"] = "college"
-        
-        # Subject area filtering
-        if any(term in query_lower for term in ["career", "job", "profession", "work"]):
-            filters["topic"] = "career_guidance"
-        elif any(term in query_lower for term in ["study", "exam", "academic", "learning"]):
-            filters["topic"] = "academic_support"
-        elif any(term in query_lower for term in ["stress", "anxiety", "mental", "emotional"]):
-            filters["topic"] = "emotional_support"
-        
-        return filters if filters else None
+        return self._filter_fn(query_lower if query_lower is not None else query.lower())
     
     def _rank_chunks(self, chunks: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
         """Rank chunks based on relevance and quality"""
         if not chunks:
             return chunks
         
+        # Query terms are the same for every chunk, so split them once
+        query_terms = frozenset(query.lower().split())
+        term_weight = 0.1 / len(query_terms) if query_terms else 0.0
+        
         # Add relevance scoring
         for chunk in chunks:
             chunk["relevance_score"] = chunk["similarity"]
             
-            # Boost score for certain indicators
-            text = chunk["text"].lower()
-            query_lower = query.lower()
+            # Chunks ingested before these signals were stored get them computed here
+            metadata = chunk.get("metadata") or {}
+            if "indicator_count" not in metadata:
+                metadata = ranking_features(chunk["text"])
             
             # Boost if chunk contains query terms
-            query_terms = set(query_lower.split())
-            text_terms = set(text.split())
-            term_overlap = len(query_terms.intersection(text_terms))
-            chunk["relevance_score"] += (term_overlap / len(query_terms)) * 0.1
+            term_overlap = len(query_terms & _chunk_terms(chunk["text"]))
+            chunk["relevance_score"] += term_overlap * term_weight
             
             # Boost for guidance-specific content
-            guidance_indicators = [
-                "guidance", "counselor", "advice", "recommend", "suggest",
-                "should", "consider", "important", "help", "support"
-            ]
-            indicator_count = sum(1 for indicator in guidance_indicators if indicator in text)
-            chunk["relevance_score"] += indicator_count * 0.05
+            chunk["relevance_score"] += metadata["indicator_count"] * 0.05
             
             # Boost for complete sentences and paragraphs
-            if len(chunk["text"]) > 100 and "." in chunk["text"]:
+            if metadata["long_with_period"]:
                 chunk["relevance_score"] += 0.05
         
         # Sort by relevance score
@@ -118,49 +307,65 @@ class RAGRetriever:
         if not chunks:
             return ""
         
-        context_parts = []
+        # Chunks are written straight into one buffer, separated by a blank line
+        buffer = io.StringIO()
         current_length = 0
         
-        for i, chunk in enumerate(chunks):
+        for chunk in chunks:
             text = chunk["text"].strip()
             
             # Check if adding this chunk would exceed max length
-            if current_length + len(text) > self.max_context_length and context_parts:
-                break
+            if current_length + len(text) > self.max_context_length:
+                if current_length:
+                    break
+                # A single oversized chunk is cut to the budget rather than sent whole
+                text = text[:self.max_context_length]
             
             # Format chunk with source info
             metadata = chunk.get("metadata", {})
             title = metadata.get("title", "Unknown Source")
             page = metadata.get("page_number")
+            source_info = f"[Source: {title}, Page {page}]" if page else f"[Source: {title}]"
             
-            source_info = f"[Source: {title}"
-            if page:
-                source_info += f", Page {page}"
-            source_info += "]"
-            
-            formatted_chunk = f"{source_info}\n{text}\n"
-            context_parts.append(formatted_chunk)
-            current_length += len(formatted_chunk)
+            if current_length:
+                buffer.write("\n")
+            buffer.write(source_info)
+            buffer.write("\n")
+            buffer.write(text)
+            buffer.write("\n")
+            current_length += len(source_info) + len(text) + 2
         
-        return "\n".join(context_parts)
+        return buffer.getvalue()
     
     def _extract_sources(self, chunks: List[Dict[str, Any]]) -> List[str]:
-        """Extract unique sources from chunks"""
-        sources = set()
+        """Extract unique sources from chunks, in ranked order"""
+        sources = {}
         for chunk in chunks:
             metadata = chunk.get("metadata", {})
-            title = metadata.get("title", "Unknown Source")
-            author = metadata.get("author", "")
-            
-            if author:
-                source = f"{title} by {author}"
-            else:
-                source = title
-            
-            sources.add(source)
+            # Chunks ingested before the label was stored get it formatted here
+            sources[metadata.get("source") or source_label(metadata)] = None
         
         return list(sources)
     
+    def _build_result(self, similar_chunks: List[Dict[str, Any]], query: str, k: int) -> RetrievalResult:
+        """Rank search hits and assemble the top k into a result"""
+        # Rank chunks
+        ranked_chunks = self._rank_chunks(similar_chunks, query)
+        
+        # Take top k chunks after ranking
+        final_chunks = ranked_chunks[:k]
+        
+        # Calculate average similarity
+        avg_similarity = sum(chunk["similarity"] for chunk in final_chunks) / len(final_chunks)
+        
+        return RetrievalResult(
+            context=self._format_context(final_chunks),
+            source_chunks=final_chunks,
+            total_chunks=len(final_chunks),
+            avg_similarity=avg_similarity,
+            sources=self._extract_sources(final_chunks)
+        )
+    
     async def retrieve(
         self, 
         query: str, 
@@ -175,20 +380,31 @@ class RAGRetriever:
             k = k or self.default_k
             similarity_threshold = similarity_threshold or self.similarity_threshold
             
-            # Preprocess query
-            processed_query = self._preprocess_query(query)
+            # Preprocess query; both keyword probes share one lowercased copy
+            query_lower = query.lower()
+            processed_query = self._preprocess_query(query, query_lower)
             logger.debug(f"Processed query: {processed_query}")
             
             # Create metadata filter
-            metadata_filter = self._create_metadata_filter(query)
+            metadata_filter = self._create_metadata_filter(query, query_lower)
             logger.debug(f"Metadata filter: {metadata_filter}")
             
+            # Embed once; the vector serves both the cache probe and the search
+            query_embedding = self.vector_store.embed_query(processed_query)
+            cache_scope = (k, similarity_threshold, tuple(sorted((metadata_filter or {}).items())))
+            
+            cached = self.semantic_cache.get(query_embedding, cache_scope)
+            if cached is not None:
+                logger.info(f"Semantic cache hit for query: {query[:100]}")
+                return cached
+            
             # Search for similar chunks
             similar_chunks = self.vector_store.search_similar(
                 query=processed_query,
                 k=k * 2,  # Get more chunks for better ranking
                 similarity_threshold=similarity_threshold,
-                metadata_filter=metadata_filter
+                metadata_filter=metadata_filter,
+                query_embedding=query_embedding
             )
             
             if not similar_chunks:
@@ -201,30 +417,10 @@ class RAGRetriever:
                     sources=[]
                 )
             
-            # Rank chunks
-            ranked_chunks = self._rank_chunks(similar_chunks, query)
-            
-            # Take top k chunks after ranking
-            final_chunks = ranked_chunks[:k]
-            
-            # Format context
-            context = self._format_context(final_chunks)
-            
-            # Extract sources
-            sources = self._extract_sources(final_chunks)
-            
-            # Calculate average similarity
-            avg_similarity = sum(chunk["similarity"] for chunk in final_chunks) / len(final_chunks)
+            result = self._build_result(similar_chunks, query, k)
+            self.semantic_cache.put(query_embedding, cache_scope, result)
             
-            result = RetrievalResult(
-                context=context,
-                source_chunks=final_chunks,
-                total_chunks=len(final_chunks),
-                avg_similarity=avg_similarity,
-                sources=sources
-            )
-            
-            logger.info(f"Retrieved {len(final_chunks)} chunks with avg similarity {avg_similarity:.3f}")
+            logger.info(f"Retrieved {result.total_chunks} chunks with avg similarity {result.avg_similarity:.3f}")
             return result
             
         except Exception as e:
@@ -248,7 +444,8 @@ class RAGRetriever:
                     "default_k": self.default_k,
                     "similarity_threshold": self.similarity_threshold,
                     "max_context_length": self.max_context_length
-                }
+                },
+                "semantic_cache": self.semantic_cache.stats()
             }
         except Exception as e:
             logger.error(f"Error getting retrieval stats: {e}")
@@ -270,21 +467,49 @@ class RAGRetriever:
         if max_context_length is not None:
             self.max_context_length = max(500, min(max_context_length, 5000))  # Limit 500-5000
         
+        # Cached contexts were formatted under the old settings
+        self.clear_cache()
+        
         logger.info(f"Updated retrieval config: k={self.default_k}, threshold={self.similarity_threshold}, max_length={self.max_context_length}")
     
     async def test_retrieval(self, test_queries: List[str]) -> Dict[str, Any]:
         """Test retrieval with a set of queries"""
         results = []
         
-        for query in test_queries:
+        try:
+            # All queries go through the encoder and vector store together
+            processed_queries = [self._preprocess_query(query) for query in test_queries]
+            metadata_filters = [self._create_metadata_filter(query) for query in test_queries]
+            batch_chunks = self.vector_store.search_similar_batch(
+                processed_queries,
+                k=self.default_k * 2,
+                similarity_threshold=self.similarity_threshold,
+                metadata_filters=metadata_filters
+            )
+        except Exception as e:
+            batch_chunks = None
+            batch_error = str(e)
+        
+        for i, query in enumerate(test_queries):
+            if batch_chunks is None:
+                results.append({"query": query, "error": batch_error})
+                continue
+            
             try:
-                result = await self.retrieve(query)
+                similar_chunks = batch_chunks[i]
+                if similar_chunks:
+                    result = self._build_result(similar_chunks, query, self.default_k)
+                    chunks_found, avg_similarity = result.total_chunks, result.avg_similarity
+                    sources, context_length = result.sources, len(result.context)
+                else:
+                    chunks_found, avg_similarity, sources, context_length = 0, 0.0, [], 0
+                
                 results.append({
                     "query": query,
-                    "chunks_found": result.total_chunks,
-                    "avg_similarity": result.avg_similarity,
-                    "sources": result.sources,
-                    "context_length": len(result.context)
+                    "chunks_found": chunks_found,
+                    "avg_similarity": avg_similarity,
+                    "sources": sources,
+                    "context_length": context_length
                 })
             except Exception as e:
                 results.append({
@@ -13,10 +13,31 @@ from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
-from .document_processor import DocumentChunk
+from .document_processor import DocumentChunk, chunk_columns
+from .quantization import ScalarQuantizer
 
 logger = logging.getLogger(__name__)
 
+# Words that mark guidance-specific content when ranking chunks
+GUIDANCE_INDICATORS = frozenset((
+    "guidance", "counselor", "advice", "recommend", "suggest",
+    "should", "consider", "important", "help", "support"
+))
+
+def source_label(metadata: Dict[str, Any]) -> str:
+    """Citation string for a chunk: its title, plus the author when known"""
+    title = metadata.get("title", "Unknown Source")
+    author = metadata.get("author", "")
+    return f"{title} by {author}" if author else title
+
+def ranking_features(text: str) -> Dict[str, Any]:
+    """Query-independent ranking signals, stored with each chunk at ingestion"""
+    text_lower = text.lower()
+    return {
+        "indicator_count": sum(1 for indicator in GUIDANCE_INDICATORS if indicator in text_lower),
+        "long_with_period": len(text) > 100 and "." in text
+    }
+
 class VectorStore:
     """Manages document embeddings and similarity search"""
     
@@ -31,6 +52,14 @@ class VectorStore:
         
         self.embedding_model_name = embedding_model
         self.collection_name = collection_name
+        self.embedding_batch_size = 64
+        self.insert_batch_size = 1000
+        
+        # Large collections are scanned from an int8 copy of the embeddings,
+        # then the best k * rerank_factor candidates are rescored in float32
+        self.quantized_search_min_chunks = 20000
+        self.quantized_rerank_factor = 4
+        self._quantized_index = None  # None = not built yet, False = collection too small
         
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -53,19 +82,35 @@ class VectorStore:
             # Collection doesn't exist, create it
             self.collection = self.client.create_collection(
                 name=collection_name,
-                metadata={"description": "Guidance counselor documents for RAG"}
+                metadata={
+                    "description": "Guidance counselor documents for RAG",
+                    # Embeddings are unit-norm, so inner product equals cosine similarity
+                    "hnsw:space": "ip"
+                }
             )
             logger.info(f"Created new collection: {collection_name}")
+        
+        # Collections created before the switch to "ip" keep ChromaDB's default l2 space
+        self.distance_space = (self.collection.metadata or {}).get("hnsw:space", "l2")
     
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of texts"""
         try:
-            embeddings = self.embedding_model.encode(texts, convert_to_tensor=False)
+            embeddings = self.embedding_model.encode(
+                texts,
+                batch_size=self.embedding_batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
             return embeddings.tolist()
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             raise
     
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a single query string"""
+        return self.embedding_model.encode([query], convert_to_numpy=True, normalize_embeddings=True)[0]
+    
     def add_chunks(self, chunks: List[DocumentChunk]) -> None:
         """Add document chunks to the vector store"""
         try:
@@ -75,22 +120,30 @@ class VectorStore:
             
             logger.info(f"Adding {len(chunks)} chunks to vector store")
             
-            # Prepare data for ChromaDB
-            texts = [chunk.text for chunk in chunks]
-            ids = [chunk.chunk_id for chunk in chunks]
-            metadatas = [chunk.metadata for chunk in chunks]
+            # Prepare data for ChromaDB as flat columns
+            columns = chunk_columns(chunks)
+            texts = columns["text"]
             
-            # Generate embeddings
+            # Generate embeddings for all texts in batched encoder calls
             logger.info("Generating embeddings...")
             embeddings = self.generate_embeddings(texts)
             
-            # Add to collection
-            self.collection.add(
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
+            # Ranking signals and the citation string are computed once here instead of on every query
+            metadatas = [
+                {**metadata, **ranking_features(text), "source": source_label(metadata)}
+                for metadata, text in zip(columns["metadata"], texts)
+            ]
+            
+            # Add to collection in slices that stay under ChromaDB's request size limit
+            for start in range(0, len(texts), self.insert_batch_size):
+                stop = start + self.insert_batch_size
+                self.collection.add(
+                    embeddings=embeddings[start:stop],
+                    documents=texts[start:stop],
+                    metadatas=metadatas[start:stop],
+                    ids=columns["chunk_id"][start:stop]
+                )
+            self._quantized_index = None
             
             logger.info(f"Successfully added {len(chunks)} chunks to vector store")
             
@@ -100,48 +153,39 @@ class VectorStore:
     
     def search_similar(
         self, 
-        query: str, 
+        query: Optional[str] = None, 
         k: int = 5,
         similarity_threshold: float = 0.0,
-        metadata_filter: Optional[Dict[str, Any]] = None
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
-        """Search for similar chunks based on query"""
+        """Search for similar chunks by query text or a precomputed query embedding"""
         try:
-            logger.debug(f"Searching for similar chunks: query='{query[:100]}...', k={k}")
+            if query is None and query_embedding is None:
+                raise ValueError("search_similar needs a query or a query_embedding")
+            logger.debug(f"Searching for similar chunks: query='{(query or '<embedding>')[:100]}...', k={k}")
             
-            # Generate query embedding
-            query_embedding = self.generate_embeddings([query])[0]
+            # Encode only when the caller has not already embedded the query
+            if query_embedding is None:
+                query_embedding = self.generate_embeddings([query])[0]
+            elif isinstance(query_embedding, np.ndarray):
+                query_embedding = query_embedding.tolist()
             
             # Prepare where clause for metadata filtering
             where_clause = metadata_filter if metadata_filter else None
             
-            # Search in collection
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=k,
-                where=where_clause,
-                include=["documents", "metadatas", "distances"]
-            )
+            results = self._quantized_search(query_embedding, k, where_clause)
+            if results is None:
+                # Search in collection
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=k,
+                    where=where_clause,
+                    include=["documents", "metadatas", "distances"]
+                )
             
             # Process results
-            similar_chunks = []
-            if results['documents'] and results['documents'][0]:
-                documents = results['documents'][0]
-                metadatas = results['metadatas'][0]
-                distances = results['distances'][0]
-                
-                for i, (doc, metadata, distance) in enumerate(zip(documents, metadatas, distances)):
-                    # Convert distance to similarity score (ChromaDB uses cosine distance)
-                    similarity = 1 - distance
-                    
-                    # Apply similarity threshold
-                    if similarity >= similarity_threshold:
-                        similar_chunks.append({
-                            "text": doc,
-                            "metadata": metadata,
-                            "similarity": similarity,
-                            "rank": i + 1
-                        })
+            similar_chunks = self._result_chunks(results, 0, similarity_threshold)
             
             logger.debug(f"Found {len(similar_chunks)} similar chunks above threshold {similarity_threshold}")
             return similar_chunks
@@ -150,6 +194,138 @@ class VectorStore:
             logger.error(f"Error searching similar chunks: {e}")
             return []
     
+    def _get_quantized_index(self):
+        """Build the int8 scan index on first use once the collection is large enough"""
+        if self._quantized_index is None:
+            if self.collection.count() < self.quantized_search_min_chunks:
+                self._quantized_index = False
+            else:
+                data = self.collection.get(include=["embeddings"])
+                embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+                quantizer = ScalarQuantizer().fit(embeddings)
+                self._quantized_index = (
+                    data["ids"],
+                    quantizer.encode(embeddings),
+                    np.einsum("ij,ij->i", embeddings, embeddings),  # squared row norms
+                    quantizer
+                )
+                logger.info(f"Built int8 search index over {len(data['ids'])} chunks")
+        return self._quantized_index
+    
+    def _quantized_search(
+        self,
+        query_embedding: List[float],
+        k: int,
+        where_clause: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Int8 candidate scan plus float32 rerank; None means fall back to ChromaDB"""
+        index = self._get_quantized_index()
+        if not index:
+            return None
+        
+        ids, codes, norms_sq, quantizer = index
+        query = np.asarray(query_embedding, dtype=np.float32)
+        space = self.distance_space
+        
+        # Turn the approximate dot product into the collection's distance ordering;
+        # for unit-norm embeddings cosine and inner product are the dot product itself
+        dots = quantizer.scores(codes, query)
+        scores = 2 * dots - norms_sq if space == "l2" else dots
+        
+        n_candidates = min(len(ids), k * self.quantized_rerank_factor)
+        top = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        rows = self.collection.get(
+            ids=[ids[i] for i in top],
+            where=where_clause,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        if len(rows["ids"]) < k:
+            # The metadata filter discarded too many candidates
+            return None
+        
+        # Exact distances on the survivors, in the same space ChromaDB would report
+        embeddings = np.asarray(rows["embeddings"], dtype=np.float32)
+        if space == "l2":
+            distances = np.sum((embeddings - query) ** 2, axis=1)
+        else:
+            distances = 1 - embeddings @ query
+        
+        order = np.argsort(distances)[:k]
+        return {
+            "documents": [[rows["documents"][i] for i in order]],
+            "metadatas": [[rows["metadatas"][i] for i in order]],
+            "distances": [distances[order].tolist()]
+        }
+    
+    def search_similar_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        similarity_threshold: float = 0.0,
+        metadata_filters: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for several queries with one encoder pass"""
+        try:
+            if not queries:
+                return []
+            
+            logger.debug(f"Batch searching {len(queries)} queries, k={k}")
+            
+            query_embeddings = self.embedding_model.encode(
+                queries,
+                batch_size=len(queries),
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            ).tolist()
+            
+            # ChromaDB applies one where clause per request, so queries sharing a filter go together
+            if metadata_filters is None:
+                metadata_filters = [None] * len(queries)
+            groups: Dict[Tuple, List[int]] = {}
+            for i, metadata_filter in enumerate(metadata_filters):
+                groups.setdefault(tuple(sorted((metadata_filter or {}).items())), []).append(i)
+            
+            all_chunks: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            for indices in groups.values():
+                results = self.collection.query(
+                    query_embeddings=[query_embeddings[i] for i in indices],
+                    n_results=k,
+                    where=metadata_filters[indices[0]] or None,
+                    include=["documents", "metadatas", "distances"]
+                )
+                for row, i in enumerate(indices):
+                    all_chunks[i] = self._result_chunks(results, row, similarity_threshold)
+            
+            return all_chunks
+            
+        except Exception as e:
+            logger.error(f"Error batch searching similar chunks: {e}")
+            return [[] for _ in queries]
+    
+    def _result_chunks(self, results: Dict[str, Any], row: int, similarity_threshold: float) -> List[Dict[str, Any]]:
+        """Turn one row of a ChromaDB query response into chunk dicts above the threshold"""
+        similar_chunks = []
+        if results['documents'] and results['documents'][row]:
+            documents = results['documents'][row]
+            metadatas = results['metadatas'][row]
+            distances = results['distances'][row]
+            
+            for i, (doc, metadata, distance) in enumerate(zip(documents, metadatas, distances)):
+                # Convert distance to similarity: cosine for "ip" collections; legacy l2
+                # collections keep their original 1 - d scale until re-ingested into "ip"
+                similarity = 1 - distance
+                
+                # Apply similarity threshold
+                if similarity >= similarity_threshold:
+                    similar_chunks.append({
+                        "text": doc,
+                        "metadata": metadata,
+                        "similarity": similarity,
+                        "rank": i + 1
+                    })
+        
+        return similar_chunks
+    
     def get_chunk_by_id(self, chunk_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve a specific chunk by ID"""
         try:
@@ -181,6 +357,7 @@ class VectorStore:
             if results['ids']:
                 chunk_ids = results['ids']
                 self.collection.delete(ids=chunk_ids)
+                self._quantized_index = None
                 logger.info(f"Deleted {len(chunk_ids)} chunks for document {doc_id}")
                 return len(chunk_ids)
             else:
@@ -233,8 +410,14 @@ class VectorStore:
             self.client.delete_collection(name=self.collection_name)
             self.collection = self.client.create_collection(
                 name=self.collection_name,
-                metadata={"description": "Guidance counselor documents for RAG"}
+                metadata={
+                    "description": "Guidance counselor documents for RAG",
+                    # Embeddings are unit-norm, so inner product equals cosine similarity
+                    "hnsw:space": "ip"
+                }
             )
+            self._quantized_index = None
+            self.distance_space = "ip"
             logger.info("Vector store collection reset successfully")
             
         except Exception as e:
@@ -100,7 +100,7 @@ async def main():
         # Step 5: Integration with Ollama Client
         print("\n5️⃣ Testing integration with Ollama Client...")
         
-        from ollama_client import OllamaClient
+        from ollama_client import OllamaClient, close_session
         
         # Initialize Ollama client
         ollama_client = OllamaClient()
@@ -133,6 +133,7 @@ async def main():
         
         # Cleanup
         await ollama_client.cleanup()
+        await close_session()
         
     except ImportError as e:
         print(f"❌ Missing dependencies: {e}")
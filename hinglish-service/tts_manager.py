@@ -14,6 +14,7 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
+from functools import cached_property
 
 try:
     import torch
@@ -71,12 +72,18 @@ class TTSResult:
     """TTS generation result"""
     success: bool
     audio_data: Optional[bytes]
-    audio_base64: Optional[str]
     engine: str
     language: str
     error: Optional[str] = None
     duration: float = 0.0
 
+    @cached_property
+    def audio_base64(self) -> Optional[str]:
+        """Base64 audio for JSON transports, encoded only when first requested"""
+        if self.audio_data is None:
+            return None
+        return base64.b64encode(self.audio_data).decode('utf-8')
+
 @dataclass
 class VoiceConfig:
     """Voice configuration for different engines"""
@@ -332,7 +339,6 @@ class HinglishTTSManager:
             return TTSResult(
                 success=False,
                 audio_data=None,
-                audio_base64=None,
                 engine="none",
                 language=language,
                 error="Empty text provided"
@@ -358,7 +364,6 @@ class HinglishTTSManager:
         return TTSResult(
             success=False,
             audio_data=None,
-            audio_base64=None,
             engine="none",
             language=language,
             error="All TTS engines failed"
@@ -407,7 +412,6 @@ class HinglishTTSManager:
             return TTSResult(
                 success=False,
                 audio_data=None,
-                audio_base64=None,
                 engine=engine.value,
                 language=language,
                 error=str(e)
@@ -434,7 +438,6 @@ class HinglishTTSManager:
         
         # Read generated audio
         audio_data = temp_file.read_bytes()
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
         
         # Clean up
         temp_file.unlink(missing_ok=True)
@@ -442,7 +445,6 @@ class HinglishTTSManager:
         return TTSResult(
             success=True,
             audio_data=audio_data,
-            audio_base64=audio_base64,
             engine=TTSEngine.COQUI.value,
             language=language
         )
@@ -462,12 +464,10 @@ class HinglishTTSManager:
         audio_buffer = io.BytesIO()
         tts.write_to_fp(audio_buffer)
         audio_data = audio_buffer.getvalue()
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
         
         return TTSResult(
             success=True,
             audio_data=audio_data,
-            audio_base64=audio_base64,
             engine=TTSEngine.GTTS.value,
             language=language
         )
@@ -504,13 +504,11 @@ class HinglishTTSManager:
         # Read generated audio
         if temp_file.exists():
             audio_data = temp_file.read_bytes()
-            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
             temp_file.unlink(missing_ok=True)
             
             return TTSResult(
                 success=True,
                 audio_data=audio_data,
-                audio_base64=audio_base64,
                 engine=TTSEngine.PYTTSX3.value,
                 language=language
             )
@@ -568,10 +566,9 @@ class HinglishTTSManager:
             temp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
             sf.write(temp_file.name, audio_arr, model.config.sampling_rate)
             
-            # Read and encode
+            # Read generated audio
             with open(temp_file.name, "rb") as f:
                 audio_data = f.read()
-                audio_base64 = base64.b64encode(audio_data).decode('utf-8')
             
             # Cleanup
             os.unlink(temp_file.name)
@@ -579,7 +576,6 @@ class HinglishTTSManager:
             return TTSResult(
                 success=True,
                 audio_data=audio_data,
-                audio_base64=audio_base64,
                 engine="indic_parler",
                 language=language,
                 duration=len(audio_arr) / model.config.sampling_rate,